@@ -0,0 +1,127 @@
+"""
+Compares cache-hit latency and memory of the current cache format, which
+stores raw JSON records, with the format of earlier versions, which stored
+whole requests.Response objects. Repeated hits on records that are kept in
+memory return the parsed record without copying it. Finally, the time and
+memory needed to open a 'pickle' and a 'sqlite' cache are compared; the
+'sqlite' cache reads entries on demand.
+
+    $ python benchmarks/bench_cache.py [entries]
+"""
+import gc
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+
+from requests import Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from unpywall.cache import UnpywallCache  # noqa: E402
+from bench_doi import record  # noqa: E402
+
+
+def response(doi: str) -> Response:
+    r = Response()
+    r.status_code = 200
+    r.headers['Content-Type'] = 'application/json'
+    r.url = 'https://api.unpaywall.org/v2/{0}'.format(doi)
+    r._content = json.dumps(record(doi)).encode('utf-8')
+    return r
+
+
+def measure(load) -> tuple:
+    """
+    Return the object built by load and the memory it allocated in bytes.
+    """
+    gc.collect()
+    tracemalloc.start()
+    obj = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def opening(name: str, doi: str) -> tuple:
+    """
+    Return the time in seconds and the memory in bytes needed to open a cache
+    and look up one entry.
+    """
+    start = time.perf_counter()
+    cache, size = measure(lambda: UnpywallCache(name))
+    cache.lookup(doi)
+    return time.perf_counter() - start, size
+
+
+def latency(get, dois: list) -> float:
+    start = time.perf_counter()
+    for doi in dois:
+        get(doi)
+    return (time.perf_counter() - start) / len(dois)
+
+
+def main(entries: int = 100000, lookups: int = 10000) -> None:
+    os.environ.setdefault('UNPAYWALL_EMAIL', 'nick.haupka@gmail.com')
+    dois = ['10.1000/bench.{0}'.format(n) for n in range(entries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_name = os.path.join(tmp, 'legacy_cache')
+        with open(legacy_name, 'wb') as handle:
+            pickle.dump({'content': {doi: response(doi) for doi in dois},
+                         'access_times': {doi: time.time()
+                                          for doi in dois}},
+                        handle)
+
+        def load_legacy():
+            with open(legacy_name, 'rb') as handle:
+                return pickle.load(handle)['content']
+
+        legacy, legacy_size = measure(load_legacy)
+        legacy_latency = latency(lambda doi: deepcopy(legacy[doi]).json(),
+                                 dois[:lookups])
+        legacy = None
+        legacy_file_size = os.path.getsize(legacy_name)
+
+        cache, cache_size = measure(lambda: UnpywallCache(legacy_name))
+        cache_latency = latency(cache.get, dois[:lookups])
+        hot = dois[:cache.memory_size]
+        latency(cache.get, hot)
+        repeat_latency = latency(cache.get, hot)
+        cache.save()
+        file_size = os.path.getsize(legacy_name)
+
+        sqlite_name = os.path.join(tmp, 'sqlite_cache')
+        UnpywallCache(sqlite_name, storage='sqlite').load(legacy_name)
+        cache = None
+        pickle_open = opening(legacy_name, dois[-1])
+        sqlite_open = opening(sqlite_name, dois[-1])
+
+    print('{0} entries'.format(entries))
+    row = '{0:>22} {1:>12} {2:>14} {3:>18}'
+    print(row.format('format', 'memory (MB)', 'hit (us)', 'repeat hit (us)'))
+    print(row.format('requests.Response',
+                     '{0:.1f}'.format(legacy_size / 1e6),
+                     '{0:.1f}'.format(legacy_latency * 1e6),
+                     '{0:.1f}'.format(legacy_latency * 1e6)))
+    print(row.format('raw JSON',
+                     '{0:.1f}'.format(cache_size / 1e6),
+                     '{0:.1f}'.format(cache_latency * 1e6),
+                     '{0:.2f}'.format(repeat_latency * 1e6)))
+    print('cache file: {0:.1f} MB before and {1:.1f} MB after'
+          ' migration'.format(legacy_file_size / 1e6, file_size / 1e6))
+    print()
+    row = '{0:>22} {1:>12} {2:>14}'
+    print(row.format('storage', 'memory (MB)', 'open (ms)'))
+    for storage, (seconds, size) in [('pickle', pickle_open),
+                                     ('sqlite', sqlite_open)]:
+        print(row.format(storage, '{0:.1f}'.format(size / 1e6),
+                         '{0:.1f}'.format(seconds * 1e3)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
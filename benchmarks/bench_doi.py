@@ -0,0 +1,86 @@
+"""
+Measures how the wall time of Unpywall.doi scales with the number of DOIs
+when every record is served from a warm cache.
+
+    $ python benchmarks/bench_doi.py
+
+The time per DOI should stay roughly constant as the number of DOIs grows.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from unpywall import Unpywall  # noqa: E402
+from unpywall.cache import UnpywallCache  # noqa: E402
+
+
+def record(doi: str) -> dict:
+    location = {'endpoint_id': None,
+                'evidence': 'open (via page says license)',
+                'host_type': 'publisher',
+                'is_best': True,
+                'license': 'cc-by',
+                'oa_date': '2018-03-23',
+                'pmh_id': None,
+                'updated': '2019-10-21T21:14:07.539484',
+                'url': 'https://example.org/{0}.pdf'.format(doi),
+                'url_for_landing_page': 'https://doi.org/{0}'.format(doi),
+                'url_for_pdf': 'https://example.org/{0}.pdf'.format(doi),
+                'version': 'publishedVersion'}
+    author = {'family': 'Doe', 'given': 'Jane', 'sequence': 'first'}
+    return {'doi': doi,
+            'doi_url': 'https://doi.org/{0}'.format(doi),
+            'best_oa_location': location,
+            'first_oa_location': location,
+            'data_standard': 2,
+            'genre': 'journal-article',
+            'is_oa': True,
+            'is_paratext': False,
+            'journal_is_in_doaj': True,
+            'journal_is_oa': True,
+            'journal_issn_l': '2167-8359',
+            'journal_issns': '2167-8359',
+            'journal_name': 'PeerJ',
+            'oa_locations': [location, location],
+            'oa_status': 'gold',
+            'published_date': '2018-02-13',
+            'publisher': 'PeerJ',
+            'title': 'The state of OA',
+            'updated': '2020-04-18T11:38:45.402591',
+            'year': 2018,
+            'z_authors': [author, author, author]}
+
+
+def main(sizes=(1000, 2000, 4000, 8000)) -> None:
+    formats = {'raw': sizes,
+               'extended': sizes}
+
+    os.environ.setdefault('UNPAYWALL_EMAIL', 'nick.haupka@gmail.com')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = UnpywallCache(os.path.join(tmp, 'cache'))
+        dois = ['10.1000/bench.{0}'.format(n) for n in range(max(sizes))]
+        for doi in dois:
+            cache.content[doi] = json.dumps(record(doi)).encode('utf-8')
+            cache.access_times[doi] = time.time()
+        cache.save()
+        Unpywall.init_cache(cache)
+
+        print('{0:>8} {1:>10} {2:>12} {3:>14}'.format('format', 'dois',
+                                                      'seconds',
+                                                      'us per doi'))
+        for format, format_sizes in formats.items():
+            for size in format_sizes:
+                start = time.perf_counter()
+                Unpywall.doi(dois[:size], format=format)
+                elapsed = time.perf_counter() - start
+                print('{0:>8} {1:>10} {2:>12.3f} {3:>14.1f}'.format(
+                    format, size, elapsed, elapsed / size * 1e6))
+
+
+if __name__ == '__main__':
+    main()
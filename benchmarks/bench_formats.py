@@ -0,0 +1,46 @@
+"""
+Compares the memory use and build time of the output formats of
+Unpywall.doi for the same records.
+
+    $ python benchmarks/bench_formats.py
+
+The arrow format stores typed, dictionary encoded columns and needs less
+memory than the normalized tables that hold the same data. The raw format
+keeps OA locations and authors as Python lists, which pandas only counts
+shallowly, so its size is understated.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from unpywall import Unpywall  # noqa: E402
+from bench_doi import record  # noqa: E402
+
+
+def size(result) -> int:
+    if hasattr(result, 'nbytes'):
+        return result.nbytes
+    if hasattr(result, 'records'):
+        return sum(size(table) for table in [result.records,
+                                             result.oa_locations,
+                                             result.authors])
+    return int(result.memory_usage(deep=True).sum())
+
+
+def main(n: int = 20000) -> None:
+    data = [record('10.1000/bench.{0}'.format(i)) for i in range(n)]
+
+    print('{0:>10} {1:>10} {2:>12} {3:>10}'.format(
+        'format', 'rows', 'MB', 'seconds'))
+    for format in ['raw', 'extended', 'normalized', 'arrow']:
+        start = time.perf_counter()
+        result = Unpywall._get_df(data=data, format=format, errors='raise')
+        elapsed = time.perf_counter() - start
+        print('{0:>10} {1:>10} {2:>12.1f} {3:>10.2f}'.format(
+            format, len(result), size(result) / 1e6, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Measures the time to build the index of an Unpaywall data dump, the size of
+the index and the latency of lookups against it, for a compressed and an
+uncompressed dump of synthetic records.
+
+    $ python benchmarks/bench_snapshot.py [records]
+"""
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from unpywall.snapshot import UnpywallSnapshot  # noqa: E402
+from bench_doi import record  # noqa: E402
+
+
+def main(records: int = 200000, lookups: int = 10000) -> None:
+    dois = ['10.1000/bench.{0}'.format(n) for n in range(records)]
+    sample = random.Random(0).sample(dois, min(lookups, records))
+
+    print('{0} records'.format(records))
+    print('{0:>14} {1:>12} {2:>12} {3:>12} {4:>14}'.format('dump',
+                                                           'size (MB)',
+                                                           'index (MB)',
+                                                           'build (s)',
+                                                           'lookup (us)'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, opener in [('snapshot.jsonl', open),
+                             ('snapshot.jsonl.gz', gzip.open)]:
+            path = os.path.join(tmp, name)
+            with opener(path, 'wt') as handle:
+                for doi in dois:
+                    handle.write(json.dumps(record(doi)) + '\n')
+
+            start = time.perf_counter()
+            snapshot = UnpywallSnapshot(path)
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for doi in sample:
+                snapshot.get(doi)
+            lookup = (time.perf_counter() - start) / len(sample)
+            snapshot.close()
+
+            print('{0:>14} {1:>12.1f} {2:>12.1f} {3:>12.2f} {4:>14.1f}'.format(
+                'gzip' if name.endswith('.gz') else 'plain',
+                os.path.getsize(path) / 1e6,
+                os.path.getsize(snapshot.index) / 1e6,
+                build,
+                lookup * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -27,7 +27,15 @@ setup(name='unpywall',
         'requests'
       ],
       extras_require={
+       'arrow': [
+           'pyarrow'
+       ],
+       'async': [
+           'aiohttp'
+       ],
        'dev': [
+           'aiohttp',
+           'pyarrow',
            'pytest',
            'coverage',
            'pytest-cov',
@@ -0,0 +1,178 @@
+import pytest
+import asyncio
+import json
+import os
+import threading
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from unpywall.cache import UnpywallCache, UnpywallRecord
+from unpywall.utils import UnpywallURL, UnpywallRateLimiter, UnpywallSession
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from unpywall.aio import AsyncUnpywall  # noqa: E402
+
+os.environ['UNPAYWALL_EMAIL'] = 'nick.haupka@gmail.com'
+
+
+class TestAsyncUnpywall:
+
+    @pytest.fixture
+    def server(self, monkeypatch):
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+            pdf = bytes(range(256)) * 1024
+            requests = []
+
+            def do_GET(self):
+                Handler.requests.append(self.path)
+                path = self.path.split('?')[0]
+
+                if path.startswith('/pdf/'):
+                    self.reply(200, self.pdf, 'application/pdf')
+                elif path.startswith('/search/'):
+                    results = [{'response': {'doi': '10.1000/{0}'.format(n)}}
+                               for n in range(3)]
+                    self.reply(200, json.dumps({'results': results}))
+                elif path.endswith('bad'):
+                    self.reply(404, b'{}')
+                elif path.endswith('busy'):
+                    self.reply(429, b'{}', retry_after='0')
+                elif (path.endswith('flaky')
+                      and Handler.requests.count(self.path) == 1):
+                    self.reply(503, b'{}', retry_after='0')
+                else:
+                    doi = path[len('/v2/'):]
+                    url = 'http://127.0.0.1:{0}/pdf/{1}'.format(
+                        self.server.server_port, doi)
+                    self.reply(200, json.dumps({
+                        'doi': doi,
+                        'best_oa_location': {'url_for_pdf': url}}))
+
+            def reply(self, status, body, content_type='application/json',
+                      retry_after=None):
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                if retry_after is not None:
+                    self.send_header('Retry-After', retry_after)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        base = 'http://127.0.0.1:{0}'.format(server.server_port)
+        monkeypatch.setattr(UnpywallURL, 'doi_url', property(
+            lambda self: '{0}/v2/{1}'.format(base, self.doi)))
+        monkeypatch.setattr(UnpywallURL, 'query_url', property(
+            lambda self: '{0}/search/?query={1}'.format(base, self.query)))
+
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = UnpywallCache(str(tmp_path / 'cache'),
+                              rate_limiter=UnpywallRateLimiter(rate=1000,
+                                                               burst=100))
+        yield cache
+
+    def test_get_json(self, server, cache):
+        handler = server.RequestHandlerClass
+        dois = ['10.1000/{0}'.format(n) for n in range(20)]
+
+        async def run():
+            async with AsyncUnpywall(cache=cache) as client:
+                records = await client.get_json(dois)
+                cached = await client.get_json(dois[0])
+                with pytest.warns(UserWarning):
+                    missing = await client.get_json('10.1000/bad',
+                                                    errors='ignore')
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await client.get_json('10.1000/bad')
+                return records, cached, missing
+
+        records, cached, missing = asyncio.run(run())
+
+        assert [record['doi'] for record in records] == dois
+        assert isinstance(records[0], UnpywallRecord)
+        assert cached is records[0]
+        assert missing is None
+        assert len(handler.requests) == len(dois) + 1
+        assert cache.failed('10.1000/bad')[0] == 404
+        assert cache.lookup(dois[-1])['doi'] == dois[-1]
+
+        with pytest.raises(AttributeError, match='Cache is not of type'):
+            AsyncUnpywall(cache='Not a UnpywallCache object.')
+
+    def test_retry(self, server, tmp_path):
+        handler = server.RequestHandlerClass
+        cache = UnpywallCache(str(tmp_path / 'cache'),
+                              rate_limiter=UnpywallRateLimiter(rate=1000,
+                                                               burst=100),
+                              session=UnpywallSession(timeout=(5, 20),
+                                                      retries=2,
+                                                      backoff_factor=0))
+
+        async def run():
+            async with AsyncUnpywall(cache=cache) as client:
+                timeout = client._get_session().timeout
+                record = await client.get_json('10.1000/flaky')
+                with pytest.raises(aiohttp.ClientResponseError) as e:
+                    await client.get_json('10.1000/busy')
+                return timeout, record, e.value.status
+
+        timeout, record, status = asyncio.run(run())
+
+        assert (timeout.sock_connect, timeout.sock_read) == (5, 20)
+        assert record['doi'] == '10.1000/flaky'
+        assert status == 429
+        assert cache.failed('10.1000/busy') is None
+        assert handler.requests.count('/v2/10.1000/flaky') == 2
+        assert handler.requests.count('/v2/10.1000/busy') == 3
+
+    def test_doi(self, server, cache):
+
+        async def run():
+            async with AsyncUnpywall(cache=cache) as client:
+                df = await client.doi(['10.1000/1', '10.1000/2'])
+                query = await client.query('test', is_oa=True)
+                with pytest.raises(ValueError,
+                                   match='The argument is_oa only accepts'):
+                    await client.query('test', is_oa='yes')
+                return df, query
+
+        df, query = asyncio.run(run())
+
+        assert isinstance(df, pd.DataFrame)
+        assert list(df['doi']) == ['10.1000/1', '10.1000/2']
+        assert list(query['doi']) == ['10.1000/0', '10.1000/1', '10.1000/2']
+
+    def test_download_pdf_file(self, server, cache, tmp_path):
+        handler = server.RequestHandlerClass
+
+        async def run():
+            async with AsyncUnpywall(cache=cache) as client:
+                link = await client.get_pdf_link('10.1000/1')
+                await client.download_pdf_file('10.1000/1',
+                                               filename='test.pdf',
+                                               filepath=str(tmp_path / 'pdf'),
+                                               chunk_size=4096)
+                return link
+
+        link = asyncio.run(run())
+
+        assert link.endswith('/pdf/10.1000/1')
+        with open(str(tmp_path / 'pdf' / 'test.pdf'), 'rb') as file:
+            assert file.read() == handler.pdf
@@ -0,0 +1,70 @@
+import pytest
+import datetime
+import os
+
+from unpywall import Unpywall
+from unpywall.backends import UnpywallCacheBackend
+from unpywall.cache import UnpywallCache
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from unpywall.arrow import UnpywallArrow  # noqa: E402
+
+os.environ['UNPAYWALL_EMAIL'] = 'nick.haupka@gmail.com'
+
+
+class TestUnpywallArrow:
+
+    test_dir = os.path.abspath(os.path.dirname(__file__))
+    test_backup_cache_path = os.path.join(test_dir, 'unpaywall_cache')
+
+    @pytest.fixture
+    def cache(self):
+        yield UnpywallCache(TestUnpywallArrow.test_backup_cache_path)
+
+    def test_to_table(self, cache):
+        data = [cache.get(doi) for doi in cache.content]
+        data.append({'doi': '10.1000/0',
+                     'published_date': 'not a date',
+                     'best_oa_location': None,
+                     'oa_locations': None,
+                     'unknown': 1})
+
+        table = UnpywallArrow.to_table(data)
+
+        assert table.schema == UnpywallArrow.schema
+        assert len(table) == len(data)
+
+        row = table.slice(2, 1).to_pylist()[0]
+        assert row['doi'] == '10.1038/nature12373'
+        assert row['is_oa'] is True
+        assert row['published_date'] == datetime.date(2013, 7, 31)
+        assert isinstance(row['updated'], datetime.datetime)
+        assert len(row['oa_locations']) == len(data[2]['oa_locations'])
+        assert len(row['z_authors']) == len(data[2]['z_authors'])
+        assert pa.types.is_dictionary(table.schema.field('oa_status').type)
+
+        row = table.slice(len(data) - 1, 1).to_pylist()[0]
+        assert row['published_date'] is None
+        assert row['best_oa_location'] is None
+        assert row['oa_locations'] is None
+
+    def test_unpywall(self, cache, tmp_path):
+        backend = UnpywallCacheBackend(cache)
+        dois = list(cache.content)
+
+        table = Unpywall.doi(dois, format='arrow', backend=backend)
+        assert isinstance(table, pa.Table)
+        assert table.column('doi').to_pylist() == dois
+
+        path = str(tmp_path / 'records.parquet')
+        n = Unpywall.write_parquet(iter(dois), path, chunk_size=2,
+                                   backend=backend)
+        assert n == len(dois)
+
+        parquet = pq.ParquetFile(path)
+        assert parquet.metadata.num_row_groups == 3
+        assert parquet.schema_arrow.field('z_authors').type == (
+            UnpywallArrow.schema.field('z_authors').type)
+        assert pq.read_table(path).column('doi').to_pylist() == dois
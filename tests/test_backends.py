@@ -0,0 +1,131 @@
+import pytest
+import json
+import os
+import pandas as pd
+from requests import Response
+
+from unpywall import Unpywall
+from unpywall.__main__ import main
+from unpywall.backends import (UnpywallBackend, UnpywallCacheBackend,
+                               UnpywallRemoteBackend)
+from unpywall.cache import UnpywallCache
+
+os.environ['UNPAYWALL_EMAIL'] = 'nick.haupka@gmail.com'
+
+
+class TestUnpywallBackend:
+
+    test_dir = os.path.abspath(os.path.dirname(__file__))
+    test_backup_cache_path = os.path.join(test_dir, 'unpaywall_cache')
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = UnpywallCache(str(tmp_path / 'cache'))
+        cache.load(TestUnpywallBackend.test_backup_cache_path)
+        Unpywall.init_cache(cache)
+        yield cache
+
+    @pytest.fixture
+    def downloads(self, monkeypatch):
+        downloads = []
+
+        def download(self, doi, errors):
+            downloads.append(doi)
+            r = Response()
+            r.status_code = 200
+            r._content = json.dumps({'doi': doi}).encode('utf-8')
+            return r
+
+        monkeypatch.setattr(UnpywallCache, 'download', download)
+        yield downloads
+
+    def test_cache_backend(self, cache, downloads):
+        doi = '10.1038/nature12373'
+
+        assert UnpywallCacheBackend(cache).get(doi)['doi'] == doi
+        assert Unpywall.get_json(doi, backend='cache')['doi'] == doi
+
+        with pytest.raises(KeyError, match='DOI not found in cache'):
+            Unpywall.get_json('10.1000/missing', backend='cache')
+
+        with pytest.warns(UserWarning):
+            assert Unpywall.get_json('10.1000/missing',
+                                     backend='cache',
+                                     errors='ignore') is None
+
+        assert downloads == []
+
+    def test_remote_backend(self, cache, monkeypatch):
+        doi = '10.1038/nature12373'
+        requests = []
+
+        class Session:
+
+            def get(self, url):
+                requests.append(url)
+                r = Response()
+                r.status_code = 200
+                r._content = json.dumps({'doi': doi}).encode('utf-8')
+                return r
+
+        backend = Unpywall._get_backend('remote')
+        assert isinstance(backend, UnpywallRemoteBackend)
+        assert backend.rate_limiter is cache.rate_limiter
+        monkeypatch.setattr(backend, 'session', Session())
+        monkeypatch.setattr(Unpywall, '_get_backend', lambda b: backend)
+        assert Unpywall.get_json(doi, backend='remote') == {'doi': doi}
+        assert len(requests) == 1
+
+        # the cache is neither used nor updated
+        assert cache.get(doi)['doi'] == doi
+        assert cache.get(doi) != {'doi': doi}
+
+        # without a cache, none is loaded
+        monkeypatch.undo()
+        monkeypatch.setattr(Unpywall, 'cache', None)
+        monkeypatch.setattr(Unpywall, 'remote', None)
+        backend = Unpywall._get_backend('remote')
+        assert Unpywall._get_backend('remote') is backend
+        monkeypatch.setattr(backend, 'session', Session())
+        assert Unpywall.get_json(doi, backend='remote') == {'doi': doi}
+        assert Unpywall.get_pdf_link(doi, backend='remote') is None
+        assert len(requests) == 3
+        assert Unpywall.cache is None
+
+    def test_default_backend(self, cache, downloads):
+        assert Unpywall._get_backend() is cache
+        assert Unpywall.get_json('10.1038/nature12373')
+        assert Unpywall.get_json('10.1000/new')['doi'] == '10.1000/new'
+        assert downloads == ['10.1000/new']
+        assert '10.1000/new' in cache.content
+
+        with pytest.raises(ValueError,
+                           match='The argument backend only accepts'):
+            Unpywall.get_json('10.1000/new', backend='not a backend')
+
+    def test_custom_backend(self, cache):
+
+        class StaticBackend(UnpywallBackend):
+
+            def get(self, doi, errors='raise', force=False,
+                    ignore_cache=False):
+                return {'doi': doi, 'is_oa': True}
+
+        df = Unpywall.doi(['10.1000/a', '10.1000/b'],
+                          backend=StaticBackend())
+        assert isinstance(df, pd.DataFrame)
+        assert list(df['doi']) == ['10.1000/a', '10.1000/b']
+
+        # a backend without get cannot be created
+        with pytest.raises(TypeError):
+            UnpywallBackend()
+
+    def test_cli(self, cache, downloads, capfd):
+        main(test_args=['link', '10.1038/nature12373', '-b', 'cache'])
+        captured = capfd.readouterr()
+        assert captured.out.strip().endswith('.pdf')
+
+        with pytest.raises(KeyError):
+            main(test_args=['link', '10.1000/missing', '-b', 'cache'])
+
+        assert downloads == []
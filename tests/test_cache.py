@@ -1,15 +1,29 @@
 import pytest
+import copy
+import json
+import requests
 import os
+import threading
 import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from requests import Response
 from shutil import copyfile
 
-from unpywall.cache import UnpywallCache
+from unpywall.cache import UnpywallCache, UnpywallRecord
+from unpywall.utils import UnpywallURL, UnpywallRateLimiter, UnpywallSession
 
 os.environ['UNPAYWALL_EMAIL'] = 'bganglia892@gmail.com'
 
 
+def put_records(name: str, worker: int, n: int) -> None:
+    cache = UnpywallCache(name)
+    for i in range(n):
+        doi = '10.1000/{0}.{1}'.format(worker, i)
+        cache.put(doi, '{{"doi": "{0}"}}'.format(doi).encode('utf-8'))
+
+
 class TestUnpywallCache:
 
     test_dir = os.path.abspath(os.path.dirname(__file__))
@@ -38,6 +52,10 @@ class TestUnpywallCache:
         assert cache.access_times != {}
         yield cache
 
+        if os.path.exists(TestUnpywallCache.test_cache_path):
+            os.remove(TestUnpywallCache.test_cache_path)
+        assert not os.path.exists(TestUnpywallCache.test_cache_path + '.lock')
+
     def test_reset_cache(self, example_cache):
         example_cache.reset_cache()
         assert example_cache.content == {}
@@ -66,8 +84,8 @@ class TestUnpywallCache:
         example_cache.delete(doi)
         assert doi not in example_cache.content
         assert doi not in example_cache.access_times
-        assert isinstance(backup_cache.get(doi), Response)
-        assert isinstance(example_cache.get(doi, ignore_cache=True), Response)
+        assert isinstance(backup_cache.get(doi), dict)
+        assert isinstance(example_cache.get(doi, ignore_cache=True), dict)
 
     def test_save_load(self, example_cache, backup_cache):
         doi = '10.1016/j.jns.2020.116832'
@@ -79,12 +97,334 @@ class TestUnpywallCache:
         example_cache.save(saved_cache_name)
         UnpywallCache(saved_cache_name)
         os.remove(saved_cache_name)
+        assert not os.path.exists(saved_cache_name + '.lock')
         path = os.path.join(os.getcwd(), 'unpaywall_cache')
         assert UnpywallCache().name == path
         os.remove(path)
+        assert not os.path.exists(path + '.lock')
         assert doi in backup_cache.content
         assert doi in backup_cache.access_times
 
     def test_download(self, example_cache):
         doi = '10.1016/j.jns.2020.116832'
         assert isinstance(example_cache.download(doi, 'raise'), Response)
+
+    def test_sqlite_storage(self, tmp_path, monkeypatch, backup_cache):
+        name = str(tmp_path / 'sqlite_cache')
+        doi = '10.1016/j.jns.2020.116832'
+
+        def download(self, doi, errors):
+            r = Response()
+            r.status_code = 200
+            r._content = backup_cache.content[doi]
+            return r
+
+        monkeypatch.setattr(UnpywallCache, 'download', download)
+
+        cache = UnpywallCache(name, storage='sqlite')
+        assert cache.content == {}
+        assert isinstance(cache.get(doi), dict)
+
+        # entries are on disk without an explicit save
+        reopened = UnpywallCache(name)
+        assert reopened.storage == 'sqlite'
+        assert doi in reopened.content
+        assert doi in reopened.access_times
+
+        copy_name = str(tmp_path / 'sqlite_copy')
+        reopened.save(copy_name)
+        assert doi in UnpywallCache(copy_name).content
+
+        reopened.delete(doi)
+        assert doi not in UnpywallCache(name).content
+
+        with pytest.raises(ValueError,
+                           match=('The argument storage only accepts the'
+                                  ' values "pickle" and "sqlite"')):
+            UnpywallCache(name, storage='not a storage')
+
+    def test_migrate(self, tmp_path, backup_cache):
+        doi = '10.1016/j.jns.2020.116832'
+
+        # the backup cache was written by a version that stored responses
+        assert isinstance(backup_cache.content[doi], bytes)
+        assert backup_cache.get(doi)['doi'] == doi
+
+        cache = UnpywallCache(str(tmp_path / 'sqlite_cache'),
+                              storage='sqlite')
+        cache.load(TestUnpywallCache.test_backup_cache_path)
+        assert set(cache.content) == set(backup_cache.content)
+        assert cache.get(doi) == backup_cache.get(doi)
+
+    def test_records(self, tmp_path):
+        doi = '10.1016/j.jns.2020.116832'
+        cache = UnpywallCache(str(tmp_path / 'cache'), memory_size=2)
+        cache.load(TestUnpywallCache.test_backup_cache_path)
+
+        record = cache.get(doi)
+        assert isinstance(record, UnpywallRecord)
+        assert cache.get(doi) is record
+
+        with pytest.raises(TypeError, match='read-only'):
+            record['doi'] = None
+        with pytest.raises(TypeError, match='read-only'):
+            record['oa_locations'].append({})
+
+        modifiable = copy.deepcopy(record)
+        modifiable['oa_locations'].append({})
+        assert type(modifiable) is dict
+        assert cache.get(doi) == UnpywallCache._parse(cache.content[doi])
+
+        for other in cache.content:
+            cache.get(other)
+        assert len(cache._records) == 2
+
+        cache.delete(doi)
+        assert doi not in cache._records
+
+    def test_lazy_sqlite(self, tmp_path):
+        name = str(tmp_path / 'sqlite_cache')
+        cache = UnpywallCache(name, storage='sqlite')
+        cache.load(TestUnpywallCache.test_backup_cache_path)
+        dois = list(cache.content)
+
+        reopened = UnpywallCache(name, mmap_size=2 ** 20)
+        assert len(reopened._records) == 0
+        assert reopened._connection.execute(
+            'PRAGMA mmap_size').fetchone()[0] == 2 ** 20
+
+        statements = []
+        reopened._connection.set_trace_callback(statements.append)
+        record = reopened.lookup(dois[0])
+        assert record == cache.lookup(dois[0])
+        assert len(statements) == 1
+        assert reopened.lookup(dois[0]) is record
+        assert reopened.lookup('10.1000/not-cached') is None
+        assert len(statements) == 2
+
+        reopened.timeout = 1
+        reopened.access_times[dois[1]] = time.time() - 2
+        assert reopened.lookup(dois[1]) is None
+        del reopened.access_times[dois[2]]
+        assert reopened.lookup(dois[2]) is None
+
+    @pytest.mark.parametrize('storage', ['pickle', 'sqlite'])
+    def test_processes(self, tmp_path, storage):
+        name = str(tmp_path / 'cache')
+        cache = UnpywallCache(name, storage=storage)
+        cache.put('10.1000/deleted', b'{"doi": "10.1000/deleted"}')
+
+        workers = 4
+        with ProcessPoolExecutor(workers) as executor:
+            list(executor.map(put_records, [name] * workers, range(workers),
+                              [25] * workers))
+
+        # entries saved by other processes are kept when this cache saves
+        cache.delete('10.1000/deleted')
+        cache.put('10.1000/main', b'{"doi": "10.1000/main"}')
+
+        reopened = UnpywallCache(name)
+        assert len(reopened.content) == workers * 25 + 1
+        assert '10.1000/deleted' not in reopened.content
+        assert reopened.lookup('10.1000/3.24')['doi'] == '10.1000/3.24'
+        assert not os.path.exists(name + '.tmp')
+        if storage == 'sqlite':
+            assert reopened._connection.execute(
+                'PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    @pytest.mark.parametrize('storage', ['pickle', 'sqlite'])
+    @pytest.mark.parametrize('eviction, evicted', [('lru', 'a'),
+                                                   ('lfu', 'b')])
+    def test_eviction(self, tmp_path, storage, eviction, evicted):
+        name = str(tmp_path / 'cache')
+        cache = UnpywallCache(name, storage=storage, max_entries=3,
+                              eviction=eviction)
+        for doi in ['a', 'b', 'c']:
+            cache.put(doi, '{{"doi": "{0}"}}'.format(doi).encode('utf-8'))
+        for doi in ['a', 'a', 'b', 'c']:
+            assert cache.lookup(doi)['doi'] == doi
+
+        cache.put('d', b'{"doi": "d"}')
+        assert evicted not in cache.content
+        assert len(cache.content) == 3
+        assert 'd' in UnpywallCache(name).content
+        assert evicted not in UnpywallCache(name).content
+
+        for _ in range(100):
+            cache.lookup('c')
+        assert len(cache._heap) <= 2 * len(cache._usage)
+
+        size = cache._usage['d'][1]
+        cache = UnpywallCache(name, max_bytes=2 * size, eviction=eviction)
+        assert cache.compact() == 1
+        assert len(cache.content) == 2
+
+        cache.timeout = 60
+        cache.access_times['d'] = time.time() - 120
+        assert cache.compact() == 1
+        assert 'd' not in cache.content
+        assert cache._bytes == size
+
+        with pytest.raises(ValueError,
+                           match=('The argument eviction only accepts the'
+                                  ' values "lru" and "lfu"')):
+            UnpywallCache(name, eviction='fifo')
+
+    def test_stats(self, tmp_path):
+        cache = UnpywallCache(str(tmp_path / 'cache'), storage='sqlite',
+                              memory_size=1)
+        for doi in ['a', 'b']:
+            cache.put(doi, '{{"doi": "{0}"}}'.format(doi).encode('utf-8'))
+
+        assert cache.lookup('b')['doi'] == 'b'
+        assert cache.lookup('a')['doi'] == 'a'
+        assert cache.lookup('a')['doi'] == 'a'
+        assert cache.lookup('c') is None
+        cache.timeout = 60
+        cache.access_times['b'] = time.time() - 120
+        assert cache.lookup('b') is None
+
+        assert cache.stats() == {'memory_hits': 2, 'memory_misses': 3,
+                                 'store_hits': 1, 'store_misses': 2,
+                                 'expired': 1, 'failures': 0,
+                                 'memory_records': 1, 'store_records': 2}
+
+        cache.reset_stats()
+        assert cache.stats()['memory_hits'] == 0
+
+    @pytest.fixture
+    def server(self, monkeypatch):
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+            version = 'v1'
+            requests = []
+
+            def do_GET(self):
+                etag = '"{0}"'.format(Handler.version)
+                Handler.requests.append(self.headers.get('If-None-Match'))
+                if self.path.endswith('text'):
+                    self.send_response(200)
+                    self.send_header('Content-Length', '4')
+                    self.end_headers()
+                    self.wfile.write(b'oops')
+                    return
+                statuses = {'bad': 404, 'denied': 403, 'down': 503}
+                status = statuses.get(self.path.rsplit('/', 1)[-1])
+                if status:
+                    self.send_response(status)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                body = json.dumps({'doi': self.path[len('/v2/'):],
+                                   'version': Handler.version}).encode()
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        base = 'http://127.0.0.1:{0}'.format(server.server_port)
+        monkeypatch.setattr(UnpywallURL, 'doi_url', property(
+            lambda self: '{0}/v2/{1}'.format(base, self.doi)))
+
+        yield Handler
+        server.shutdown()
+        server.server_close()
+
+    @pytest.mark.parametrize('storage', ['pickle', 'sqlite'])
+    def test_revalidate(self, tmp_path, server, storage):
+        doi = '10.1000/1'
+        cache = UnpywallCache(str(tmp_path / 'cache'), storage=storage,
+                              timeout=60, stale_while_revalidate=3600,
+                              rate_limiter=UnpywallRateLimiter(rate=1000,
+                                                               burst=100))
+        record = cache.get(doi)
+        assert record['version'] == 'v1'
+        assert cache.validators[doi] == {'ETag': '"v1"'}
+
+        # an expired record is returned and refreshed in the background
+        cache.access_times[doi] = time.time() - 120
+        assert cache.get(doi) is record
+        cache._queue.join()
+        assert server.requests == [None, '"v1"']
+        assert not cache.timed_out(doi)
+        assert cache.get(doi) is record
+        assert len(server.requests) == 2
+
+        # force only retrieves the record if it has changed
+        assert cache.get(doi, force=True) is record
+        server.version = 'v2'
+        assert cache.get(doi, force=True)['version'] == 'v2'
+        assert server.requests[2:] == ['"v1"', '"v1"']
+        assert cache.validators[doi] == {'ETag': '"v2"'}
+
+        # records beyond the stale period are retrieved before returning
+        cache.access_times[doi] = time.time() - 7200
+        assert cache.get(doi)['version'] == 'v2'
+        assert server.requests[4:] == ['"v2"']
+
+        # a refresh that fails does not stop later refreshes
+        for stale in ['10.1000/text', '10.1000/2']:
+            cache.put(stale, b'{"version": "v0"}')
+            cache.access_times[stale] = time.time() - 120
+        with pytest.warns(UserWarning, match='Could not revalidate doi'):
+            assert cache.get('10.1000/text')['version'] == 'v0'
+            cache._queue.join()
+        assert cache.get('10.1000/2')['version'] == 'v0'
+        cache._queue.join()
+        assert cache.lookup('10.1000/2')['version'] == 'v2'
+
+    @pytest.mark.parametrize('storage', ['pickle', 'sqlite'])
+    def test_failures(self, tmp_path, server, storage):
+        doi = '10.1000/bad'
+        name = str(tmp_path / 'cache')
+        cache = UnpywallCache(name, storage=storage,
+                              rate_limiter=UnpywallRateLimiter(rate=1000,
+                                                               burst=100),
+                              session=UnpywallSession(retries=0))
+
+        with pytest.warns(UserWarning, match='Could not download doi'):
+            assert cache.get(doi, errors='ignore') is None
+        assert cache.failures[doi][0] == 404
+        assert len(server.requests) == 1
+
+        # known failures return without a request
+        reopened = UnpywallCache(name, rate_limiter=cache.rate_limiter)
+        with pytest.warns(UserWarning, match='Could not download doi'):
+            assert reopened.get(doi, errors='ignore') is None
+        with pytest.raises(requests.exceptions.HTTPError) as error:
+            reopened.get(doi)
+        assert error.value.response.status_code == 404
+        assert len(server.requests) == 1
+        assert reopened.stats()['failures'] == 2
+
+        # server errors and errors that do not depend on the DOI are not
+        # remembered
+        for other in ['10.1000/down', '10.1000/denied']:
+            with pytest.raises(requests.exceptions.HTTPError):
+                cache.get(other)
+            assert other not in cache.failures
+
+        cache.failures[doi] = (404, time.time() - 2 * cache.failure_timeout)
+        assert cache.failed(doi) is None
+        cache.compact()
+        assert doi not in cache.failures
+        cache.failure_timeout = 0
+        with pytest.raises(requests.exceptions.HTTPError):
+            cache.get(doi)
+        assert len(server.requests) == 4
@@ -1,6 +1,10 @@
+from unpywall import Unpywall
 from unpywall.__main__ import main
 from requests.exceptions import HTTPError
+import pandas as pd
 import pytest
+import shutil
+import json
 import os
 
 os.environ['UNPAYWALL_EMAIL'] = 'nick.haupka@gmail.com'
@@ -41,6 +45,32 @@ class TestUnpywallCli:
 
             assert pytest_raise_system_exit.value.code == 2
 
+    def test_download_many(self, tmp_path, monkeypatch, capfd):
+        calls = []
+
+        def download_pdf_files(dois, **kwargs):
+            calls.append((dois, kwargs))
+            df = pd.DataFrame({'doi': dois,
+                               'status': ['downloaded', 'skipped', 'failed']})
+            df.attrs['throughput'] = 1.5
+            return df
+
+        monkeypatch.setattr(Unpywall, 'download_pdf_files',
+                            download_pdf_files)
+
+        path = tmp_path / 'dois.txt'
+        path.write_text('10.1000/2\n\n')
+        main(test_args=['download', '10.1000/0', '10.1000/1', '-i',
+                        str(path), '-w', '8', '--per-host', '3'])
+
+        dois, kwargs = calls[0]
+        assert dois == ['10.1000/0', '10.1000/1', '10.1000/2']
+        assert kwargs['workers'] == 8
+        assert kwargs['per_host'] == 3
+        captured = capfd.readouterr()
+        assert captured.out == ('1 files downloaded, 0 resumed, 1 skipped,'
+                                ' 1 failed (1.50 MB/s).\n')
+
     def test_link(self):
         with pytest.raises(SystemExit) as pytest_raise_system_exit:
             main(test_args=['link'])
@@ -50,3 +80,101 @@ class TestUnpywallCli:
         with pytest.raises(HTTPError):
             bad_doi = 'bad_doi'
             main(test_args=['link', bad_doi])
+
+    @pytest.fixture
+    def batch(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Unpywall, 'cache', Unpywall.cache)
+
+        cache = str(tmp_path / 'cache')
+        shutil.copy(os.path.join(os.path.dirname(__file__),
+                                 'unpaywall_cache'), cache)
+
+        dois = ['10.1038/nature12373',
+                '10.1016/j.tmaid.2020.101663',
+                '10.1016/j.envint.2020.105730',
+                'bad_doi']
+        path = tmp_path / 'dois.txt'
+
+        def run(output, *options, dois=dois):
+            path.write_text('\n'.join(dois) + '\n')
+            main(test_args=['batch', '-i', str(path), '-o', str(output),
+                            '-c', cache, '-b', 'cache', '-n', '2']
+                 + list(options))
+
+        yield run
+
+    def test_batch(self, batch, tmp_path, capfd):
+        dois = ['10.1038/nature12373', '10.1016/j.tmaid.2020.101663']
+
+        output = tmp_path / 'records.jsonl'
+        with pytest.warns(UserWarning):
+            batch(output)
+        records = [json.loads(line) for line in output.open()]
+        assert len(records) == 3
+        assert records[0]['doi'] == dois[0]
+        assert '3 records written, 0 skipped' in capfd.readouterr().err
+
+        output = tmp_path / 'records.csv'
+        batch(output, '-w', '2', dois=dois)
+        df = pd.read_csv(output)
+        assert list(df['doi']) == dois
+
+        with pytest.raises(SystemExit):
+            batch(tmp_path / 'records', '-f', 'parquet', '-o', '-')
+
+    def test_batch_resume(self, batch, tmp_path, capfd):
+        dois = ['10.1038/nature12373',
+                '10.1016/j.tmaid.2020.101663',
+                '10.1016/j.envint.2020.105730']
+
+        # an interrupted batch that left an incomplete line behind
+        output = tmp_path / 'records.jsonl'
+        batch(output, dois=dois[:1])
+        with output.open('a') as handle:
+            handle.write('{"doi": "10.1016/j.tmaid')
+        capfd.readouterr()
+
+        batch(output, '-r', dois=dois)
+        records = [json.loads(line) for line in output.open()]
+        assert [record['doi'] for record in records] == dois
+        assert '2 records written, 1 skipped' in capfd.readouterr().err
+
+        output = tmp_path / 'records.csv'
+        batch(output, dois=dois[:2])
+        batch(output, '--resume', dois=dois)
+        df = pd.read_csv(output)
+        assert list(df['doi']) == dois
+
+        # an interrupted batch that wrote only some rows of a DOI
+        output = tmp_path / 'extended.csv'
+        batch(output, '-t', 'extended', dois=dois)
+        expected = output.read_text()
+        lines = expected.splitlines(keepends=True)
+        rows = list(pd.read_csv(output)['doi'])
+        assert rows.count(dois[2]) > 1
+        output.write_text(''.join(lines[:rows.index(dois[2]) + 2]))
+        capfd.readouterr()
+
+        batch(output, '-t', 'extended', '-r', dois=dois)
+        assert output.read_text() == expected
+        assert '2 skipped' in capfd.readouterr().err
+
+        # the first run of a resumable batch creates the file
+        output = tmp_path / 'new.csv'
+        batch(output, '--resume', dois=dois)
+        assert list(pd.read_csv(output)['doi']) == dois
+
+    def test_batch_parquet(self, batch, tmp_path):
+        pytest.importorskip('pyarrow')
+        dois = ['10.1038/nature12373',
+                '10.1016/j.tmaid.2020.101663',
+                '10.1016/j.envint.2020.105730']
+
+        output = tmp_path / 'records'
+        batch(output, '-f', 'parquet', dois=dois[:1])
+        batch(output, '-f', 'parquet', '-r', dois=dois)
+        parts = sorted(os.listdir(output))
+        assert parts == ['part-00000.parquet', 'part-00001.parquet']
+
+        df = pd.read_parquet(output)
+        assert sorted(df['doi']) == sorted(dois)
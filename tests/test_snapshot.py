@@ -0,0 +1,110 @@
+import pytest
+import gzip
+import json
+import os
+import pandas as pd
+
+from unpywall import Unpywall
+from unpywall.__main__ import main
+from unpywall.cache import UnpywallCache, UnpywallRecord
+from unpywall.snapshot import UnpywallSnapshot
+
+os.environ['UNPAYWALL_EMAIL'] = 'nick.haupka@gmail.com'
+
+
+class TestUnpywallSnapshot:
+
+    test_dir = os.path.abspath(os.path.dirname(__file__))
+    test_backup_cache_path = os.path.join(test_dir, 'unpaywall_cache')
+
+    @pytest.fixture
+    def records(self):
+        cache = UnpywallCache(TestUnpywallSnapshot.test_backup_cache_path)
+        yield [cache.get(doi) for doi in cache.content]
+
+    @pytest.fixture(params=['snapshot.jsonl', 'snapshot.jsonl.gz'])
+    def snapshot_path(self, request, tmp_path, records):
+        path = str(tmp_path / request.param)
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt') as handle:
+            for record in records:
+                handle.write(json.dumps(record) + '\n')
+        yield path
+
+    def test_init(self, snapshot_path, records):
+        snapshot = UnpywallSnapshot(snapshot_path)
+
+        assert snapshot.compressed == snapshot_path.endswith('.gz')
+        assert os.path.exists(snapshot.index)
+        assert len(snapshot) == len(records)
+        assert isinstance(repr(snapshot), str)
+
+        # the records of a compressed dump share compressed blocks
+        blocks = snapshot._connection.execute(
+            'SELECT COUNT(*) FROM blocks').fetchone()[0]
+        assert blocks == (1 if snapshot.compressed else 0)
+
+        # the index is only built once
+        modified = os.path.getmtime(snapshot.index)
+        UnpywallSnapshot(snapshot_path).close()
+        assert os.path.getmtime(snapshot.index) == modified
+
+        with pytest.raises(FileNotFoundError, match='No snapshot found'):
+            UnpywallSnapshot(snapshot_path + '.missing')
+
+    def test_get(self, snapshot_path, records):
+        snapshot = UnpywallSnapshot(snapshot_path)
+
+        for record in records:
+            assert snapshot.get(record['doi']) == record
+            assert record['doi'].upper() in snapshot
+
+        assert isinstance(snapshot.get(records[0]['doi']), UnpywallRecord)
+
+        with pytest.raises(KeyError, match='DOI not found in snapshot'):
+            snapshot.get('a bad doi')
+
+        with pytest.warns(UserWarning):
+            assert snapshot.get('a bad doi', errors='ignore') is None
+
+    @pytest.mark.parametrize('name', ['blank.jsonl', 'blank.jsonl.gz'])
+    def test_blank_lines(self, tmp_path, name):
+        path = str(tmp_path / name)
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt') as handle:
+            handle.write('{"doi": "10.1/a"}\n\n{"doi": "10.1/b"}\n'
+                         '   \n{"doi": "10.1/c"}\n')
+
+        snapshot = UnpywallSnapshot(path)
+
+        assert len(snapshot) == 3
+        for doi in ['10.1/a', '10.1/b', '10.1/c']:
+            assert snapshot.get(doi)['doi'] == doi
+        snapshot.close()
+
+    def test_unpywall(self, snapshot_path, records):
+        Unpywall.init_snapshot(snapshot_path)
+        doi = '10.1038/nature12373'
+
+        assert Unpywall.get_json(doi, backend='snapshot')['doi'] == doi
+        assert isinstance(Unpywall.get_pdf_link(doi, backend='snapshot'),
+                          str)
+
+        df = Unpywall.doi([record['doi'] for record in records],
+                          backend='snapshot')
+        assert isinstance(df, pd.DataFrame)
+        assert len(df) == len(records)
+
+        with pytest.raises(ValueError,
+                           match='The argument backend only accepts'):
+            Unpywall.get_json(doi, backend='not a backend')
+
+        with pytest.raises(AttributeError,
+                           match='Snapshot is not of type'):
+            Unpywall.init_snapshot(1)
+
+    def test_cli(self, snapshot_path, capfd):
+        main(test_args=['link', '10.1038/nature12373', '-b', 'snapshot',
+                        '-s', snapshot_path])
+        captured = capfd.readouterr()
+        assert captured.out.strip().endswith('.pdf')
@@ -1,11 +1,21 @@
 import pytest
 import pandas as pd
 import os
-from io import BytesIO
+import copy
+import json
+import threading
+import time
+import itertools
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from requests import Response
 from requests.exceptions import HTTPError
 
 from unpywall import Unpywall
+from unpywall.backends import UnpywallBackend, UnpywallCacheBackend
 from unpywall.cache import UnpywallCache
+from unpywall.tables import UnpywallTables
+from unpywall.utils import UnpywallRateLimiter
 
 test_cache = UnpywallCache(os.path.join(
     os.path.abspath(
@@ -27,6 +37,7 @@ class TestUnpywall:
         path = os.path.join(os.getcwd(), 'unpaywall_cache')
         assert Unpywall.cache.name == path
         os.remove(path)
+        assert not os.path.exists(path + '.lock')
 
         with pytest.raises(
          AttributeError, match='Cache is not of type {0}'.format(
@@ -62,7 +73,8 @@ class TestUnpywall:
 
         with pytest.raises(ValueError,
                            match=('The argument format only accepts the'
-                                  ' values "raw" and "extended"')):
+                                  ' values "raw", "extended", "normalized"'
+                                  ' and "arrow"')):
             assert Unpywall._get_df(data=data,
                                     format='not a valid format',
                                     errors='raise')
@@ -79,6 +91,97 @@ class TestUnpywall:
 
         assert isinstance(df_extended, pd.DataFrame)
 
+        df_batch = Unpywall._get_df(data=[data, data],
+                                    format='raw',
+                                    errors='ignore')
+
+        assert len(df_batch) == 2 * len(df_raw)
+
+        df_batch = Unpywall._get_df(data=[data, data],
+                                    format='extended',
+                                    errors='ignore')
+
+        assert len(df_batch) == 2 * len(df_extended)
+
+    def test_get_extended_df(self, Unpywall):
+
+        def merge(data):
+            # reference: merge the normalized record, its oa_locations and
+            # its z_authors on the DOI
+            record = pd.json_normalize(data, max_level=1).drop(
+                columns=['oa_locations', 'z_authors'])
+            oa_locations = pd.json_normalize(data, meta='doi',
+                                             record_path=['oa_locations'])
+            z_authors = pd.json_normalize(data, meta='doi',
+                                          record_path=['z_authors'])
+            return record.merge(oa_locations, how='outer', on='doi').merge(
+                z_authors, how='outer', on='doi')
+
+        def normalize(df):
+            return df.astype(object).where(df.notna(), None)
+
+        data = [copy.deepcopy(test_cache.get(doi))
+                for doi in test_cache.content]
+        data[1]['z_authors'] = None
+        data[2]['oa_locations'] = []
+        data[2]['best_oa_location'] = None
+        data[3]['oa_locations'][0]['extra'] = 1
+
+        df = Unpywall._get_df(data=data, format='extended', errors='raise')
+        expected = pd.concat([merge(obj) for obj in data],
+                             ignore_index=True)
+
+        assert list(df.columns) == list(expected.columns)
+        assert {'updated_x', 'updated_y'} <= set(df.columns)
+        pd.testing.assert_frame_equal(normalize(df), normalize(expected))
+
+        sizes = df.groupby('doi', sort=False).size()
+        assert sizes[data[0]['doi']] == (len(data[0]['oa_locations'])
+                                         * len(data[0]['z_authors']))
+        assert sizes[data[1]['doi']] == len(data[1]['oa_locations'])
+        assert sizes[data[2]['doi']] == len(data[2]['z_authors'])
+
+        with pytest.raises(KeyError):
+            Unpywall._get_df(data={'doi': '10.1000/0'},
+                             format='extended',
+                             errors='raise')
+
+    def test_normalized(self, Unpywall):
+
+        data = [test_cache.get(doi) for doi in test_cache.content]
+        tables = Unpywall._get_df(data=data,
+                                  format='normalized',
+                                  errors='raise')
+
+        assert isinstance(tables, UnpywallTables)
+        assert len(tables) == len(data)
+        assert len(tables.oa_locations) == sum(len(obj['oa_locations'])
+                                               for obj in data)
+        assert len(tables.authors) == sum(len(obj['z_authors'])
+                                          for obj in data)
+        assert tables.oa_locations.columns[0] == 'doi'
+        assert 'oa_locations' not in tables.records.columns
+
+        # joins are only done on demand
+        extended = Unpywall._get_df(data=data,
+                                    format='extended',
+                                    errors='raise')
+        joined = tables.join()
+        assert list(joined.columns) == list(extended.columns)
+        pd.testing.assert_frame_equal(
+            joined.astype(object).where(joined.notna(), None),
+            extended.astype(object).where(extended.notna(), None))
+        assert len(tables.join('oa_locations')) == len(tables.oa_locations)
+
+        with pytest.raises(ValueError,
+                           match='The argument tables only accepts'):
+            tables.join('records')
+
+        tables = Unpywall.doi(dois=['10.1038/nature12373'],
+                              format='normalized')
+        assert isinstance(tables, UnpywallTables)
+        assert list(tables.records['doi']) == ['10.1038/nature12373']
+
     def test_doi(self, Unpywall, capfd):
 
         df = Unpywall.doi(dois=['10.1038/nature12373'],
@@ -97,6 +200,82 @@ class TestUnpywall:
 
             assert df_empty is None
 
+    def test_doi_workers(self, tmp_path, monkeypatch):
+
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def download(self, doi, errors):
+            with lock:
+                active.append(doi)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(doi)
+            r = Response()
+            r.status_code = 200
+            r._content = json.dumps({'doi': doi}).encode('utf-8')
+            return r
+
+        monkeypatch.setattr(UnpywallCache, 'download', download)
+        Unpywall.init_cache(UnpywallCache(str(tmp_path / 'cache')))
+
+        dois = ['10.1000/{0}'.format(n) for n in range(20)]
+
+        df = Unpywall.doi(dois=dois, workers=4)
+        assert list(df['doi']) == dois
+        assert max(peak) > 1
+
+        records = Unpywall.get_json(doi=dois, workers=4)
+        assert [record['doi'] for record in records] == dois
+
+        with pytest.raises(ValueError,
+                           match='The argument workers must be a positive'):
+            Unpywall.doi(dois=dois, workers=0)
+
+        Unpywall.init_cache(test_cache)
+
+    def test_iter_doi(self):
+
+        class Backend(UnpywallBackend):
+
+            def __init__(self):
+                self.requested = []
+
+            def get(self, doi, errors='raise', **kwargs):
+                self.requested.append(doi)
+                if doi.endswith('bad'):
+                    return None
+                return {'doi': doi, 'is_oa': True}
+
+        backend = Backend()
+        dois = ['10.1000/{0}'.format(n) for n in range(5)]
+
+        records = Unpywall.iter_json(iter(dois + ['10.1000/bad']),
+                                     backend=backend)
+        assert [record['doi'] for record in records] == dois
+
+        chunks = list(Unpywall.iter_doi(iter(dois),
+                                        chunk_size=2,
+                                        backend=backend))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert list(pd.concat(chunks)['doi']) == dois
+
+        # endless iterables are consumed lazily
+        backend.requested = []
+        endless = ('10.1000/{0}'.format(n) for n in itertools.count())
+        chunk = next(Unpywall.iter_doi(endless,
+                                       chunk_size=3,
+                                       workers=2,
+                                       backend=backend))
+        assert list(chunk['doi']) == dois[:3]
+        assert len(backend.requested) < 10
+
+        with pytest.raises(ValueError,
+                           match='The argument chunk_size must be a'):
+            next(Unpywall.iter_doi(dois, chunk_size=0, backend=backend))
+
     def test_query(self, Unpywall):
 
         df = Unpywall.query(query='test',
@@ -141,10 +320,180 @@ class TestUnpywall:
         assert isinstance(
             Unpywall.get_all_links('10.1016/j.tmaid.2020.101663'), list)
 
+    def test_links(self, Unpywall):
+
+        class Backend(UnpywallBackend):
+
+            def __init__(self):
+                self.requested = []
+                self.cache = UnpywallCacheBackend(test_cache)
+
+            def get(self, doi, errors='raise', **kwargs):
+                self.requested.append(doi)
+                return self.cache.get(doi, errors=errors)
+
+        backend = Backend()
+        dois = ['10.1038/nature12373', '10.1016/j.tmaid.2020.101663']
+
+        with pytest.warns(UserWarning):
+            df = Unpywall.links(dois + ['bad_doi'],
+                                errors='ignore',
+                                backend=backend)
+
+        assert list(df['doi']) == dois + ['bad_doi']
+        assert backend.requested == dois + ['bad_doi']
+        assert df['pdf_link'][0] == Unpywall.get_pdf_link(dois[0])
+        assert df['doc_link'][1] == Unpywall.get_doc_link(dois[1])
+        assert df['landing_page'][0].startswith('http://nrs.harvard.edu')
+        assert 'http://arxiv.org/abs/1304.1068' in df['oa_links'][0]
+        assert df['oa_links'][2] is None
+
+        backend.requested = []
+        links = Unpywall.get_all_links(dois[0], backend=backend)
+        assert links == [df['doc_link'][0]]
+        assert backend.requested == dois[:1]
+
     def test_download_pdf_handle(self, Unpywall):
 
-        assert isinstance(
-            Unpywall.download_pdf_handle('10.1038/nature12373'), BytesIO)
+        handle = Unpywall.download_pdf_handle('10.1038/nature12373')
+        assert isinstance(handle, tempfile.SpooledTemporaryFile)
+        assert handle.read(5) == b'%PDF-'
+
+    def test_download_pdf_handle_stream(self, Unpywall, pdf_server):
+
+        url = 'http://127.0.0.1:{0}/paper.pdf'.format(pdf_server.server_port)
+        body = pdf_server.RequestHandlerClass.body
+
+        class Backend(UnpywallBackend):
+
+            def get(self, doi, errors='raise', **kwargs):
+                return {'doi': doi, 'best_oa_location': {'url_for_pdf': url}}
+
+        # binary data is returned unchanged, in memory and spooled to disk
+        for max_size in [len(body) + 1, 1024]:
+            handle = Unpywall.download_pdf_handle('10.1000/0',
+                                                  backend=Backend(),
+                                                  max_size=max_size,
+                                                  chunk_size=4096)
+            assert handle.read(1000) == body[:1000]
+            assert handle.read() == body[1000:]
+            handle.close()
+
+    @pytest.fixture
+    def pdf_server(self):
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+            body = bytes(range(256)) * 4096
+            ranges = []
+            active = []
+            peak = []
+            lock = threading.Lock()
+
+            def do_GET(self):
+                with Handler.lock:
+                    Handler.active.append(self.path)
+                    Handler.peak.append(len(Handler.active))
+                time.sleep(0.05)
+
+                start = 0
+                header = self.headers.get('Range')
+                if header:
+                    Handler.ranges.append(header)
+                    start = int(header[len('bytes='):-1])
+                    self.send_response(206)
+                    self.send_header('Content-Range',
+                                     'bytes {0}-{1}/{2}'.format(
+                                         start,
+                                         len(Handler.body) - 1,
+                                         len(Handler.body)))
+                else:
+                    self.send_response(200)
+                body = Handler.body[start:]
+                self.send_header('Content-Type', 'application/pdf')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+                with Handler.lock:
+                    Handler.active.remove(self.path)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    def test_download_pdf_files(self, Unpywall, pdf_server, tmp_path,
+                                monkeypatch):
+
+        url = 'http://127.0.0.1:{0}/'.format(pdf_server.server_port)
+        handler = pdf_server.RequestHandlerClass
+        limiter = UnpywallRateLimiter(rate=1000, burst=100)
+        monkeypatch.setattr(Unpywall.cache, 'rate_limiter', limiter)
+
+        class Backend(UnpywallBackend):
+
+            def get(self, doi, errors='raise', **kwargs):
+                if doi == '10.1000/closed':
+                    return {'doi': doi, 'best_oa_location': None}
+                return {'doi': doi,
+                        'best_oa_location': {'url_for_pdf': url + doi}}
+
+        dois = ['10.1000/{0}'.format(n) for n in range(4)]
+        filepath = str(tmp_path / 'pdfs')
+
+        with pytest.warns(UserWarning):
+            df = Unpywall.download_pdf_files(dois + ['10.1000/closed'],
+                                             filepath=filepath,
+                                             workers=4,
+                                             per_host=1,
+                                             backend=Backend())
+
+        assert list(df['doi']) == dois + ['10.1000/closed']
+        assert list(df['status']) == ['downloaded'] * 4 + ['failed']
+        assert df['bytes'].sum() == 4 * len(handler.body)
+        assert df.attrs['throughput'] > 0
+        assert max(handler.peak) == 1
+        # every PDF request passes the rate limiter of the cache
+        assert limiter.calls == 4
+
+        path = os.path.join(filepath, '10.1000_0.pdf')
+        with open(path, 'rb') as file:
+            assert file.read() == handler.body
+
+        # complete files are skipped and partial files are resumed
+        os.remove(path)
+        with open(path + '.part', 'wb') as file:
+            file.write(handler.body[:1000])
+
+        df = Unpywall.download_pdf_files(dois,
+                                         filepath=filepath,
+                                         chunk_size=4096,
+                                         backend=Backend())
+
+        assert list(df['status']) == ['resumed'] + ['skipped'] * 3
+        assert df['bytes'][0] == len(handler.body) - 1000
+        assert handler.ranges == ['bytes=1000-']
+        assert not os.path.exists(path + '.part')
+        with open(path, 'rb') as file:
+            assert file.read() == handler.body
+
+        with pytest.raises(ValueError,
+                           match='No PDF available for doi'):
+            Unpywall.download_pdf_files(['10.1000/closed'],
+                                        filepath=filepath,
+                                        errors='raise',
+                                        backend=Backend())
+
+        with pytest.raises(ValueError,
+                           match='The argument per_host must be a positive'):
+            Unpywall.download_pdf_files(dois, per_host=0)
 
     def test_progress(self, Unpywall, capfd):
         Unpywall._progress(0.5)
@@ -1,6 +1,14 @@
 import pytest
+import requests
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib3.util.retry import RequestHistory
 
-from unpywall.utils import UnpywallCredentials, UnpywallURL
+from unpywall.utils import (UnpywallCredentials, UnpywallURL,
+                            UnpywallRateLimiter, UnpywallSession,
+                            UnpywallRetry)
 
 
 class TestUnpywallCredentials:
@@ -49,3 +57,159 @@ class TestUnpywallURL:
         url = UnpywallURL(query=query).query_url
 
         assert isinstance(url, str)
+
+
+class TestUnpywallRateLimiter:
+
+    def test_init(self, monkeypatch):
+
+        monkeypatch.setenv('MANDATORY_WAIT_TIME', '0.5')
+        assert UnpywallRateLimiter().rate == 2
+
+        monkeypatch.setenv('MANDATORY_WAIT_TIME', '0')
+        assert UnpywallRateLimiter().acquire() == 0
+
+        with pytest.raises(ValueError,
+                           match='The argument rate must be a positive'):
+            assert UnpywallRateLimiter(rate=0)
+
+        with pytest.raises(ValueError,
+                           match='The argument burst must be a positive'):
+            assert UnpywallRateLimiter(rate=1, burst=0)
+
+        assert isinstance(repr(UnpywallRateLimiter(rate=1)), str)
+
+    def test_acquire(self):
+
+        limiter = UnpywallRateLimiter(rate=20, burst=2)
+
+        assert limiter.acquire() == 0
+        assert limiter.acquire() == 0
+        assert limiter.acquire() > 0
+        assert limiter.calls == 3
+        assert limiter.total_wait == pytest.approx(limiter.last_wait)
+
+        time.sleep(0.1)
+        assert limiter.acquire() == 0
+
+    def test_threads(self):
+
+        limiter = UnpywallRateLimiter(rate=50)
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire)
+                   for _ in range(11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert limiter.calls == 11
+        assert time.monotonic() - start >= 0.19
+        assert limiter.max_wait == pytest.approx(0.2, abs=0.02)
+
+
+class TestUnpywallSession:
+
+    @pytest.fixture
+    def server(self):
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+            clients = set()
+            requests = Counter()
+
+            def do_GET(self):
+                Handler.clients.add(self.client_address)
+                Handler.requests[self.path] += 1
+                body = b'{}'
+
+                # /busy is rate limited once, /down fails twice
+                if self.path == '/busy' and Handler.requests[self.path] == 1:
+                    self.send_response(429)
+                    self.send_header('Retry-After', '5')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if self.path == '/down' and Handler.requests[self.path] <= 2:
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if self.path == '/slow':
+                    time.sleep(0.5)
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    def test_init(self):
+
+        session = UnpywallSession(pool_size=4, timeout=5, retries=2)
+        adapter = session.session.get_adapter('https://api.unpaywall.org')
+
+        assert adapter.max_retries.total == 2
+        assert adapter._pool_maxsize == 4
+        assert isinstance(repr(session), str)
+
+    def test_get(self, server):
+
+        session = UnpywallSession()
+        url = 'http://127.0.0.1:{0}/'.format(server.server_port)
+
+        for _ in range(3):
+            assert session.get(url).json() == {}
+
+        # all requests were sent over the same connection
+        assert len(server.RequestHandlerClass.clients) == 1
+
+        session.close()
+
+    def test_retry(self, server):
+        handler = server.RequestHandlerClass
+        url = 'http://127.0.0.1:{0}'.format(server.server_port)
+        session = UnpywallSession(retries=2, backoff_factor=0.01,
+                                  max_retry_after=0.2)
+
+        # Retry-After is honored up to max_retry_after
+        start = time.monotonic()
+        assert session.get(url + '/busy').json() == {}
+        assert 0.2 <= time.monotonic() - start < 2
+        assert handler.requests['/busy'] == 2
+
+        assert session.get(url + '/down').status_code == 200
+        assert handler.requests['/down'] == 3
+
+        # a read timeout is retried as well
+        session = UnpywallSession(timeout=(1, 0.1), retries=1)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get(url + '/slow')
+        assert handler.requests['/slow'] == 2
+
+    def test_backoff(self):
+        history = (RequestHistory('GET', '/', None, 503, None),) * 3
+        retry = UnpywallRetry(total=5, backoff_factor=1, jitter=0.5)
+        retry = retry.new(history=history)
+
+        assert retry.jitter == 0.5
+        backoffs = [retry.get_backoff_time() for _ in range(100)]
+        assert min(backoffs) >= 2
+        assert max(backoffs) <= 4
+        assert len(set(backoffs)) > 1
+
+        retry = UnpywallRetry(total=5, backoff_factor=1, jitter=0)
+        assert retry.new(history=history).get_backoff_time() == 4
+        assert retry.parse_retry_after('1000') == 120
@@ -1,4 +1,3 @@
-import requests
 import pandas as pd
 import sys
 import subprocess
@@ -6,10 +5,19 @@ import tempfile
 import webbrowser
 import os
 import platform
-from io import BytesIO
-from functools import reduce
-
+import re
+import threading
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from .backends import (UnpywallBackend, UnpywallCacheBackend,
+                       UnpywallRemoteBackend)
 from .cache import UnpywallCache
+from .snapshot import UnpywallSnapshot
+from .tables import UnpywallTables
 
 
 class Unpywall:
@@ -21,6 +29,8 @@ class Unpywall:
 
     api_limit: int = 100000
     cache = None
+    snapshot = None
+    remote = None
 
     @staticmethod
     def init_cache(cache=None) -> None:
@@ -47,6 +57,111 @@ class Unpywall:
         else:
             Unpywall.cache = UnpywallCache()
 
+    @staticmethod
+    def init_snapshot(snapshot=None) -> None:
+        """
+        This method initializes a local copy of the Unpaywall data dump that
+        is used by the 'snapshot' backend.
+
+        Parameters
+        ----------
+        snapshot: UnpywallSnapshot or str
+            The snapshot or the path of the data dump. By default, the path
+            is read from the environment variable UNPAYWALL_SNAPSHOT.
+
+        Raises
+        ------
+        AttributeError
+            If the snapshot is not of type UnpywallSnapshot or str.
+        ValueError
+            If no snapshot is given and UNPAYWALL_SNAPSHOT is not set.
+        """
+        if not snapshot:
+            snapshot = os.environ.get('UNPAYWALL_SNAPSHOT')
+            if not snapshot:
+                raise ValueError('A snapshot is required in order to use the'
+                                 ' snapshot backend')
+
+        if isinstance(snapshot, str):
+            snapshot = UnpywallSnapshot(snapshot, progress=True)
+
+        if not isinstance(snapshot, UnpywallSnapshot):
+            raise AttributeError(
+                'Snapshot is not of type {0}'.format(UnpywallSnapshot))
+
+        Unpywall.snapshot = snapshot
+
+    @staticmethod
+    def _get_session() -> tuple:
+        """
+        This method returns the HTTP session and the rate limiter shared by
+        all requests. They belong to the cache if it is initialized and to
+        the remote backend otherwise, so the cache is not loaded for them.
+
+        Returns
+        -------
+        tuple
+            The UnpywallSession and the UnpywallRateLimiter.
+        """
+        if Unpywall.cache:
+            return Unpywall.cache.session, Unpywall.cache.rate_limiter
+        remote = Unpywall._get_backend('remote')
+        return remote.session, remote.rate_limiter
+
+    @staticmethod
+    def _get_backend(backend=None) -> UnpywallBackend:
+        """
+        This method returns the backend used to look up records.
+
+        Parameters
+        ----------
+        backend : str or UnpywallBackend
+            The data source of the records. None uses the cache and
+            retrieves missing records from Unpaywall. 'cache' only uses the
+            cache, 'remote' bypasses the cache and 'snapshot' uses a local
+            data dump.
+
+        Returns
+        -------
+        UnpywallBackend
+            The backend.
+
+        Raises
+        ------
+        ValueError
+            If the backend is not supported.
+        """
+        if isinstance(backend, UnpywallBackend):
+            return backend
+
+        if backend == 'remote':
+            # the cache is not loaded, only its session and rate limiter are
+            # shared if it already exists
+            if Unpywall.cache:
+                return UnpywallRemoteBackend(Unpywall.cache.session,
+                                             Unpywall.cache.rate_limiter)
+            if not Unpywall.remote:
+                Unpywall.remote = UnpywallRemoteBackend()
+            return Unpywall.remote
+
+        if backend == 'snapshot':
+            if not Unpywall.snapshot:
+                Unpywall.init_snapshot()
+            return Unpywall.snapshot
+
+        if backend is not None and backend != 'cache':
+            raise ValueError('The argument backend only accepts the values'
+                             ' "cache", "remote", "snapshot" and objects of'
+                             ' type {0}'.format(UnpywallBackend))
+
+        if not Unpywall.cache:
+            Unpywall.init_cache()
+
+        if backend is None:
+            return Unpywall.cache
+
+        return UnpywallCacheBackend(Unpywall.cache)
+
     @staticmethod
     def _validate_dois(dois: list) -> list:
         """
@@ -82,6 +197,103 @@ class Unpywall:
 
         return dois
 
+    @staticmethod
+    def _validate_workers(workers: int) -> int:
+        """
+        This method checks the number of workers used to fetch DOIs.
+
+        Parameters
+        ----------
+        workers : int
+            The number of threads used to retrieve records.
+
+        Returns
+        -------
+        int
+            The number of workers.
+
+        Raises
+        ------
+        ValueError
+            If workers is not a positive integer.
+        """
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError('The argument workers must be a positive'
+                             ' integer')
+
+        return workers
+
+    @staticmethod
+    def _fetch(dois,
+               errors: str,
+               force: bool,
+               ignore_cache: bool,
+               workers: int = 1,
+               backend: str = None):
+        """
+        Yields the JSON records for the given DOIs in input order. With more
+        than one worker, cache misses are downloaded concurrently while the
+        cache keeps the requests within its global rate budget.
+
+        Parameters
+        ----------
+        dois : iterable
+            An iterable of DOIs.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than errors will not raise an exception.
+        force : bool
+            Whether to force the cache to retrieve a new entry.
+        ignore_cache : bool
+            Whether to use or ignore the cache.
+        workers : int
+            The number of threads used to retrieve records.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
+
+        Yields
+        ------
+        JSON object
+            The record of each DOI or None if it could not be retrieved.
+        """
+        workers = Unpywall._validate_workers(workers)
+
+        # resolve the backend once instead of once per thread
+        backend = Unpywall._get_backend(backend)
+
+        def fetch(doi):
+            return Unpywall.get_json(doi,
+                                     errors=errors,
+                                     force=force,
+                                     ignore_cache=ignore_cache,
+                                     backend=backend)
+
+        if workers == 1:
+            for doi in dois:
+                yield fetch(doi)
+            return
+
+        # only keep a bounded number of lookups in flight, so that long or
+        # endless iterables of DOIs are consumed lazily
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = deque()
+        try:
+            for doi in dois:
+                futures.append(executor.submit(fetch, doi))
+                if len(futures) >= 2 * workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+        finally:
+            # stop pending downloads if the caller stops early or an error
+            # is raised
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
     @staticmethod
     def _progress(progress: float) -> None:
         """
@@ -114,18 +326,21 @@ class Unpywall:
 
         Parameters
         ----------
-        data: JSON object
+        data: JSON object or list
             A JSON data structure containing all information
-            returned by Unpaywall about a given input.
+            returned by Unpaywall about a given input. A list of JSON
+            objects is parsed into a single DataFrame in one pass.
         format: str
-            The format of the DataFrame.
+            The format of the DataFrame. 'normalized' returns the records,
+            OA locations and authors as three tables and 'arrow' returns a
+            pyarrow Table.
         errors : str
             Either 'raise' or 'ignore'. If the parameter errors is set to
             'ignore' than errors will not raise an exception.
 
         Returns
         -------
-        DataFrame
+        DataFrame, UnpywallTables or pyarrow.Table
             A pandas DataFrame that contains information from the Unpaywall
             API service.
 
@@ -135,42 +350,163 @@ class Unpywall:
             If the parameter errors contains a faulty value.
         """
 
-        if format not in ['raw', 'extended']:
+        if format not in ['raw', 'extended', 'normalized', 'arrow']:
             raise ValueError('The argument format only accepts the'
-                             ' values "raw" and "extended"')
+                             ' values "raw", "extended", "normalized" and'
+                             ' "arrow"')
 
-        if format == 'extended':
+        if format == 'arrow':
+            from .arrow import UnpywallArrow
 
-            doi_object = pd.json_normalize(data=data,
-                                           max_level=1,
-                                           errors=errors)
+            if not isinstance(data, list):
+                data = [data]
+            df = UnpywallArrow.to_table(data)
 
-            doi_object.drop(columns=['oa_locations',
-                                     'z_authors'],
-                            errors=errors,
-                            inplace=True)
+        elif format == 'normalized':
+            if not isinstance(data, list):
+                data = [data]
+            df = UnpywallTables.from_records(data)
 
-            oa_locations = pd.json_normalize(data=data,
-                                             errors=errors,
-                                             meta='doi',
-                                             record_path=['oa_locations'])
-
-            z_authors = pd.json_normalize(data=data,
-                                          errors=errors,
-                                          meta='doi',
-                                          record_path=['z_authors'])
-
-            dfs = [doi_object, oa_locations, z_authors]
-            df = reduce(lambda left, right: pd.merge(left,
-                                                     right,
-                                                     how='outer',
-                                                     on='doi'), dfs)
+        elif format == 'extended':
+            if not isinstance(data, list):
+                data = [data]
+            df = Unpywall._get_extended_df(data, errors)
 
         else:
             df = pd.json_normalize(data=data, max_level=1, errors=errors)
 
         return df
 
+    @staticmethod
+    def _flatten(obj: dict,
+                 max_level: int = None,
+                 prefix: str = '',
+                 level: int = 0) -> dict:
+        """
+        Flatten nested dictionaries into keys separated by '.' in the same
+        order as pandas.json_normalize.
+        """
+        flat = {}
+        nested = []
+        for key, value in obj.items():
+            key = str(key)
+            if isinstance(value, dict) and (max_level is None
+                                            or level < max_level):
+                if level:
+                    flat.update(Unpywall._flatten(value,
+                                                  max_level,
+                                                  prefix + key + '.',
+                                                  level + 1))
+                else:
+                    # top-level keys keep their position and nested keys
+                    # are appended at the end
+                    nested.append((key, value))
+            else:
+                flat[prefix + key] = value
+
+        for key, value in nested:
+            flat.update(Unpywall._flatten(value,
+                                          max_level,
+                                          prefix + key + '.',
+                                          level + 1))
+        return flat
+
+    @staticmethod
+    def _get_list(obj: dict, key: str) -> list:
+        """
+        Return the list of nested records of obj under key.
+        """
+        value = obj[key]
+        if isinstance(value, list):
+            return value
+        if value is None:
+            return []
+        raise TypeError('{0} must contain a list or null, but got {1}'.format(
+            key, type(value).__name__))
+
+    @staticmethod
+    def _get_extended_df(data: list, errors: str) -> pd.DataFrame:
+        """
+        Build the extended format for a batch of records at once. Each record
+        has one row per combination of OA location and author, and the
+        columns are the same as merging the normalized record, its
+        oa_locations and its z_authors on the DOI.
+
+        All records are flattened in a first pass, which fixes the columns
+        and the number of rows. The columns are then preallocated and filled
+        in a second pass, so the DataFrame is created only once.
+        """
+        missing = float('nan')
+
+        parts = []
+        columns = {}
+        total = 0
+
+        for obj in data:
+            record = Unpywall._flatten(obj, max_level=1)
+            dropped = [key for key in ['oa_locations', 'z_authors']
+                       if key not in record]
+            if dropped and errors == 'raise':
+                raise KeyError('{0} not found in axis'.format(dropped))
+            for key in ['oa_locations', 'z_authors']:
+                record.pop(key, None)
+
+            keys = [list(record)]
+            tables = []
+            names = list(record)
+            for key in ['oa_locations', 'z_authors']:
+                rows = [Unpywall._flatten(row)
+                        for row in Unpywall._get_list(obj, key)]
+                table = {}
+                for row in rows:
+                    table.update(dict.fromkeys(row))
+                table.pop('doi', None)
+
+                # overlapping columns are renamed like pandas.merge does
+                overlap = set(names) & set(table)
+                overlap.discard('doi')
+                names = [name + '_x' if name in overlap else name
+                         for name in names]
+                names += [name + '_y' if name in overlap else name
+                          for name in table]
+                keys.append(list(table))
+                tables.append(rows)
+
+            # split the final column names into record, location and author
+            # columns
+            offsets = [0, len(keys[0]), len(keys[0]) + len(keys[1])]
+            keys = [list(zip(part, names[offset:offset + len(part)]))
+                    for part, offset in zip(keys, offsets)]
+            columns.update(dict.fromkeys(names))
+
+            size = max(1, len(tables[0])) * max(1, len(tables[1]))
+            parts.append((record, tables, keys, total, size))
+            total += size
+
+        df = {name: [missing] * total for name in columns}
+
+        for record, (locations, authors), keys, start, size in parts:
+            end = start + size
+            repeat = max(1, len(authors))
+
+            for key, name in keys[0]:
+                df[name][start:end] = [record[key]] * size
+
+            # each location is repeated for every author
+            for key, name in keys[1]:
+                column = df[name]
+                for n, row in enumerate(locations):
+                    column[start + n * repeat:start + (n + 1) * repeat] = (
+                        [row.get(key, missing)] * repeat)
+
+            for key, name in keys[2]:
+                values = [row.get(key, missing) for row in authors]
+                column = df[name]
+                for n in range(start, end, repeat):
+                    column[n:n + repeat] = values
+
+        return pd.DataFrame(df, columns=list(columns))
+
     @staticmethod
     def query(query: str,
               is_oa: bool = False,
@@ -188,7 +524,10 @@ class Unpywall:
             A boolean value indicating whether the returned records should be
             Open Access or not.
         format: str
-            The format of the DataFrame.
+            The format of the DataFrame: 'raw', 'extended', 'normalized' or
+            'arrow'. 'normalized' returns an UnpywallTables object with the
+            records, OA locations and authors as separate tables. 'arrow'
+            returns a pyarrow Table with a declared schema.
         errors : str
             Either 'raise' or 'ignore'. If the parameter errors is set to
             'ignore' than errors will not raise an exception.
@@ -202,15 +541,16 @@ class Unpywall:
 
         data = Unpywall.get_json(query=query, is_oa=is_oa, errors=errors)
 
-        df = pd.DataFrame()
+        records = [obj['response'] for obj in data['results']]
 
-        for obj in data['results']:
-            df2 = Unpywall._get_df(data=obj['response'],
-                                   format=format,
-                                   errors=errors)
-            df = pd.concat([df, df2], ignore_index=True)
+        if not records:
+            return None
+
+        df = Unpywall._get_df(data=records,
+                              format=format,
+                              errors=errors)
 
-        if df.empty:
+        if len(df) == 0:
             return None
 
         return df
@@ -221,7 +561,9 @@ class Unpywall:
             progress: bool = False,
             errors: str = 'raise',
             force: bool = False,
-            ignore_cache: bool = False):
+            ignore_cache: bool = False,
+            workers: int = 1,
+            backend: str = None):
         """
         Parses information for a given DOI from the Unpaywall API service and
         returns it as a pandas DataFrame.
@@ -231,7 +573,10 @@ class Unpywall:
         dois : list
             A list of DOIs.
         format: str
-            The format of the DataFrame.
+            The format of the DataFrame: 'raw', 'extended', 'normalized' or
+            'arrow'. 'normalized' returns an UnpywallTables object with the
+            records, OA locations and authors as separate tables. 'arrow'
+            returns a pyarrow Table with a declared schema.
         progress : bool
             Whether the progress of the API call should be printed out or not.
         errors : str
@@ -241,6 +586,14 @@ class Unpywall:
             Whether to force the cache to retrieve a new entry.
         ignore_cache : bool
             Whether to use or ignore the cache.
+        workers : int
+            The number of threads used to retrieve records. The rows of the
+            DataFrame keep the order of the input DOIs.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
 
         Returns
         -------
@@ -251,46 +604,247 @@ class Unpywall:
 
         dois = Unpywall._validate_dois(dois)
 
-        df = pd.DataFrame()
+        records = []
 
-        for n, doi in enumerate(dois, start=1):
+        fetched = Unpywall._fetch(dois,
+                                  errors=errors,
+                                  force=force,
+                                  ignore_cache=ignore_cache,
+                                  workers=workers,
+                                  backend=backend)
+
+        for n, data in enumerate(fetched, start=1):
 
             if progress:
                 Unpywall._progress(n / len(dois))
 
-            data = Unpywall.get_json(doi,
-                                     errors=errors,
-                                     force=force,
-                                     ignore_cache=ignore_cache)
-
             # check if json is not empty or None due to an faulty DOI
             if not bool(data):
                 continue
 
-            df2 = Unpywall._get_df(data=data,
-                                   format=format,
-                                   errors=errors)
-            df = pd.concat([df, df2], ignore_index=True)
+            records.append(data)
 
-        if df.empty:
+        if not records:
+            return None
+
+        # normalize all records at once instead of growing the DataFrame
+        # inside the loop, which copies it on every DOI
+        df = Unpywall._get_df(data=records,
+                              format=format,
+                              errors=errors)
+
+        if len(df) == 0:
             return None
 
         return df
 
+    @staticmethod
+    def iter_json(dois,
+                  errors: str = 'raise',
+                  force: bool = False,
+                  ignore_cache: bool = False,
+                  workers: int = 1,
+                  backend: str = None):
+        """
+        Yields the JSON record of each DOI as soon as it is available. Unlike
+        Unpywall.doi, DOIs are consumed lazily, so any iterable such as an
+        open file or a generator can be passed and memory use does not grow
+        with the number of DOIs.
+
+        Parameters
+        ----------
+        dois : iterable
+            An iterable of DOIs.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than errors will not raise an exception.
+        force : bool
+            Whether to force the cache to retrieve a new entry.
+        ignore_cache : bool
+            Whether to use or ignore the cache.
+        workers : int
+            The number of threads used to retrieve records. Records are
+            yielded in the order of the input DOIs.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
+
+        Yields
+        ------
+        JSON object
+            The record of each DOI. DOIs that could not be retrieved are
+            skipped.
+        """
+        dois = (doi.strip() for doi in dois if doi and doi.strip())
+
+        fetched = Unpywall._fetch(dois,
+                                  errors=errors,
+                                  force=force,
+                                  ignore_cache=ignore_cache,
+                                  workers=workers,
+                                  backend=backend)
+
+        for data in fetched:
+            # skip records that are empty or None due to an faulty DOI
+            if data:
+                yield data
+
+    @staticmethod
+    def iter_doi(dois,
+                 chunk_size: int = 1000,
+                 format: str = 'raw',
+                 errors: str = 'raise',
+                 force: bool = False,
+                 ignore_cache: bool = False,
+                 workers: int = 1,
+                 backend: str = None):
+        """
+        Yields pandas DataFrames with at most chunk_size rows each while the
+        DOIs are retrieved. Each chunk can be processed or written to disk
+        before the remaining DOIs are retrieved.
+
+        Parameters
+        ----------
+        dois : iterable
+            An iterable of DOIs.
+        chunk_size : int
+            The maximum number of records in each DataFrame.
+        format: str
+            The format of the DataFrames: 'raw', 'extended', 'normalized' or
+            'arrow'. 'normalized' yields UnpywallTables objects with the
+            records, OA locations and authors as separate tables. 'arrow'
+            yields pyarrow Tables with a declared schema.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than errors will not raise an exception.
+        force : bool
+            Whether to force the cache to retrieve a new entry.
+        ignore_cache : bool
+            Whether to use or ignore the cache.
+        workers : int
+            The number of threads used to retrieve records. The rows keep
+            the order of the input DOIs.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
+
+        Yields
+        ------
+        DataFrame
+            A pandas DataFrame that contains information from the Unpaywall
+            API service for the next chunk of DOIs.
+
+        Raises
+        ------
+        ValueError
+            If chunk_size is not a positive integer.
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError('The argument chunk_size must be a positive'
+                             ' integer')
+
+        records = []
+
+        for data in Unpywall.iter_json(dois,
+                                       errors=errors,
+                                       force=force,
+                                       ignore_cache=ignore_cache,
+                                       workers=workers,
+                                       backend=backend):
+            records.append(data)
+
+            if len(records) == chunk_size:
+                yield Unpywall._get_df(data=records,
+                                       format=format,
+                                       errors=errors)
+                records = []
+
+        if records:
+            yield Unpywall._get_df(data=records,
+                                   format=format,
+                                   errors=errors)
+
+    @staticmethod
+    def write_parquet(dois,
+                      path: str,
+                      chunk_size: int = 10000,
+                      errors: str = 'raise',
+                      force: bool = False,
+                      ignore_cache: bool = False,
+                      workers: int = 1,
+                      backend: str = None) -> int:
+        """
+        Writes the records of the given DOIs to a Parquet file while they
+        are retrieved. Every chunk of records is written as a row group with
+        the declared schema of UnpywallArrow, so memory use does not grow
+        with the number of DOIs. This requires pyarrow.
+
+        Parameters
+        ----------
+        dois : iterable
+            An iterable of DOIs.
+        path : str
+            The path of the Parquet file.
+        chunk_size : int
+            The number of records in each row group.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than errors will not raise an exception.
+        force : bool
+            Whether to force the cache to retrieve a new entry.
+        ignore_cache : bool
+            Whether to use or ignore the cache.
+        workers : int
+            The number of threads used to retrieve records.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
+
+        Returns
+        -------
+        int
+            The number of records written.
+        """
+        from .arrow import UnpywallArrow
+
+        n = 0
+        with UnpywallArrow.writer(path) as writer:
+            for table in Unpywall.iter_doi(dois,
+                                           chunk_size=chunk_size,
+                                           format='arrow',
+                                           errors=errors,
+                                           force=force,
+                                           ignore_cache=ignore_cache,
+                                           workers=workers,
+                                           backend=backend):
+                writer.write_table(table)
+                n += len(table)
+
+        return n
+
     @staticmethod
     def get_json(doi: str = None,
                  query: str = None,
                  is_oa: bool = False,
                  errors: str = 'raise',
                  force: bool = False,
-                 ignore_cache: bool = False):
+                 ignore_cache: bool = False,
+                 workers: int = 1,
+                 backend: str = None):
         """
         This function returns all information in Unpaywall about the given DOI.
 
         Parameters
         ----------
-        doi : str
-            The DOI of the requested paper.
+        doi : str or list
+            The DOI of the requested paper. If a list of DOIs is given, a list
+            of JSON objects in the same order is returned.
         query : str
             The text to search for.
         is_oa : bool
@@ -303,6 +857,14 @@ class Unpywall:
             Whether to force the cache to retrieve a new entry.
         ignore_cache : bool
             Whether to use or ignore the cache.
+        workers : int
+            The number of threads used to retrieve records if a list of DOIs
+            is given.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
 
         Returns
         -------
@@ -315,14 +877,21 @@ class Unpywall:
         AttributeError
             If the Unpaywall API did not respond with json.
         """
-        if not Unpywall.cache:
-            Unpywall.init_cache()
+        if isinstance(doi, list):
+            dois = Unpywall._validate_dois(doi)
+            return list(Unpywall._fetch(dois,
+                                        errors=errors,
+                                        force=force,
+                                        ignore_cache=ignore_cache,
+                                        workers=workers,
+                                        backend=backend))
 
         if doi:
-            r = Unpywall.cache.get(doi,
-                                   errors=errors,
-                                   force=force,
-                                   ignore_cache=ignore_cache)
+            return Unpywall._get_backend(backend).get(
+                doi,
+                errors=errors,
+                force=force,
+                ignore_cache=ignore_cache)
         if query:
 
             if type(is_oa) != bool:
@@ -333,14 +902,18 @@ class Unpywall:
 
             url = UnpywallURL(query=query, is_oa=is_oa).query_url
 
-            r = requests.get(url)
+            if not Unpywall.cache:
+                Unpywall.init_cache()
+
+            Unpywall.cache.rate_limiter.acquire()
+            r = Unpywall.cache.session.get(url)
         try:
             return r.json()
         except AttributeError:
             return None
 
     @staticmethod
-    def get_pdf_link(doi: str) -> str:
+    def get_pdf_link(doi: str, backend: str = None) -> str:
         """
         This function returns a link to an OA pdf (if available).
 
@@ -348,20 +921,25 @@ class Unpywall:
         ----------
         doi: str
             The DOI of the requested paper.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
 
         Returns
         -------
         str
             The URL of an OA PDF (if available).
         """
-        json_data = Unpywall.get_json(doi)
+        json_data = Unpywall.get_json(doi, backend=backend)
         try:
             return json_data['best_oa_location']['url_for_pdf']
         except (KeyError, TypeError):
             return None
 
     @staticmethod
-    def get_doc_link(doi: str) -> str:
+    def get_doc_link(doi: str, backend: str = None) -> str:
         """
         This function returns a link to the best OA location
         (not necessarily a PDF).
@@ -370,20 +948,25 @@ class Unpywall:
         ----------
         doi : str
             The DOI of the requested paper.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
 
         Returns
         -------
         str
             The URL of the best OA location (not necessarily a PDF).
         """
-        json_data = Unpywall.get_json(doi)
+        json_data = Unpywall.get_json(doi, backend=backend)
         try:
             return json_data['best_oa_location']['url']
         except (KeyError, TypeError):
             return None
 
     @staticmethod
-    def get_all_links(doi: str) -> list:
+    def get_all_links(doi: str, backend: str = None) -> list:
         """
         This function returns a list of URLs for all open-access copies
         listed in Unpaywall.
@@ -392,42 +975,164 @@ class Unpywall:
         ----------
         doi : str
             The DOI of the requested paper.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
 
         Returns
         -------
         list
             A list of URLs leading to open-access copies.
         """
+        links = Unpywall._get_links(Unpywall.get_json(doi, backend=backend))
+
         data = []
-        for value in [Unpywall.get_doc_link(doi),
-                      Unpywall.get_pdf_link(doi)]:
+        for value in [links['doc_link'], links['pdf_link']]:
             if value and value not in data:
                 data.append(value)
         return data
 
     @staticmethod
-    def download_pdf_handle(doi: str) -> BytesIO:
+    def links(dois: list,
+              errors: str = 'raise',
+              force: bool = False,
+              ignore_cache: bool = False,
+              workers: int = 1,
+              backend: str = None) -> pd.DataFrame:
+        """
+        This function returns the OA links of many DOIs as a pandas
+        DataFrame. Each record is retrieved only once for all links.
+
+        Parameters
+        ----------
+        dois : list
+            A list of DOIs.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than errors will not raise an exception.
+        force : bool
+            Whether to force the cache to retrieve a new entry.
+        ignore_cache : bool
+            Whether to use or ignore the cache.
+        workers : int
+            The number of threads used to retrieve records. The rows keep
+            the order of the input DOIs.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
+
+        Returns
+        -------
+        DataFrame
+            A pandas DataFrame with one row per DOI and the columns doi,
+            pdf_link (the PDF of the best OA location), doc_link (the best
+            OA location), landing_page (the landing page of the best OA
+            location) and oa_links (a list of every URL of all OA
+            locations). The links of a DOI that could not be retrieved are
+            None.
+        """
+        dois = Unpywall._validate_dois(dois)
+
+        fetched = Unpywall._fetch(dois,
+                                  errors=errors,
+                                  force=force,
+                                  ignore_cache=ignore_cache,
+                                  workers=workers,
+                                  backend=backend)
+
+        rows = []
+        for doi, data in zip(dois, fetched):
+            links = Unpywall._get_links(data)
+            links['doi'] = doi
+            rows.append(links)
+
+        return pd.DataFrame(rows, columns=['doi', 'pdf_link', 'doc_link',
+                                           'landing_page', 'oa_links'])
+
+    @staticmethod
+    def _get_links(data) -> dict:
+        """
+        Extract the links of a record in a single pass.
+        """
+        if not data:
+            return {'pdf_link': None,
+                    'doc_link': None,
+                    'landing_page': None,
+                    'oa_links': None}
+
+        best = data.get('best_oa_location') or {}
+
+        oa_links = []
+        for location in data.get('oa_locations') or []:
+            for key in ('url_for_pdf', 'url', 'url_for_landing_page'):
+                url = location.get(key)
+                if url and url not in oa_links:
+                    oa_links.append(url)
+
+        return {'pdf_link': best.get('url_for_pdf'),
+                'doc_link': best.get('url'),
+                'landing_page': best.get('url_for_landing_page'),
+                'oa_links': oa_links}
+
+    @staticmethod
+    def download_pdf_handle(doi: str,
+                            backend: str = None,
+                            max_size: int = 10 * 1024 * 1024,
+                            chunk_size: int = 1024 * 1024
+                            ) -> tempfile.SpooledTemporaryFile:
         """
         This function returns a file-like object containing the requested PDF.
+        The PDF is streamed into the handle. It is kept in memory up to
+        max_size bytes and moved to a temporary file on disk beyond that.
 
         Parameters
         ----------
         doi : str
             The DOI of the requested paper.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
+        max_size : int
+            The number of bytes kept in memory before the PDF is written to
+            disk.
+        chunk_size : int
+            The number of bytes read from the response at once.
 
         Returns
         -------
-        BytesIO
-            The handle of the PDF file.
+        SpooledTemporaryFile
+            The binary handle of the PDF file, positioned at the start.
+
+        Raises
+        ------
+        HTTPError
+            If the PDF could not be downloaded.
         """
-        pdf_link = Unpywall.get_pdf_link(doi)
-        r = requests.get(pdf_link)
-        return BytesIO(bytearray(r.text, encoding='utf-8'))
+        pdf_link = Unpywall.get_pdf_link(doi, backend=backend)
+        session, rate_limiter = Unpywall._get_session()
+        rate_limiter.acquire()
+
+        handle = tempfile.SpooledTemporaryFile(max_size=max_size)
+
+        with session.get(pdf_link, stream=True) as r:
+            r.raise_for_status()
+            for chunk in r.iter_content(chunk_size):
+                handle.write(chunk)
+
+        handle.seek(0)
+        return handle
 
     @staticmethod
     def view_pdf(doi: str,
                  mode: str = 'viewer',
-                 progress: bool = False) -> None:
+                 progress: bool = False,
+                 backend: str = None) -> None:
         """
         This function opens a local copy of a PDF from a given DOI.
 
@@ -439,10 +1144,17 @@ class Unpywall:
             The mode for viewing a PDF.
         progress : bool
             Whether the progress of the API call should be printed out or not.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
         """
 
-        url = Unpywall.get_pdf_link(doi)
-        r = requests.get(url, stream=url)
+        url = Unpywall.get_pdf_link(doi, backend=backend)
+        session, rate_limiter = Unpywall._get_session()
+        rate_limiter.acquire()
+        r = session.get(url, stream=True)
         file_size = int(r.headers.get('content-length', 0))
         block_size = 1024
 
@@ -475,7 +1187,8 @@ class Unpywall:
     def download_pdf_file(doi: str,
                           filename: str,
                           filepath: str = '.',
-                          progress: bool = False) -> None:
+                          progress: bool = False,
+                          backend: str = None) -> None:
         """
         This function downloads a PDF from a given DOI.
 
@@ -489,10 +1202,17 @@ class Unpywall:
             The path to store the downloaded PDF.
         progress : bool
             Whether the progress of the API call should be printed out or not.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
         """
 
-        url = Unpywall.get_pdf_link(doi)
-        r = requests.get(url, stream=url)
+        url = Unpywall.get_pdf_link(doi, backend=backend)
+        session, rate_limiter = Unpywall._get_session()
+        rate_limiter.acquire()
+        r = session.get(url, stream=True)
         file_size = int(r.headers.get('content-length', 0))
         block_size = 1024
 
@@ -508,3 +1228,182 @@ class Unpywall:
                     chunk_size += len(chunk)
                     Unpywall._progress(chunk_size / file_size)
                 file.write(chunk)
+
+    @staticmethod
+    def download_pdf_files(dois: list,
+                           filepath: str = '.',
+                           workers: int = 4,
+                           per_host: int = 2,
+                           chunk_size: int = 1024 * 1024,
+                           progress: bool = False,
+                           errors: str = 'ignore',
+                           backend: str = None) -> pd.DataFrame:
+        """
+        This function downloads the PDFs of many DOIs concurrently. Each PDF
+        is stored as the DOI with unsafe characters replaced, e.g.
+        10.1038_nature12373.pdf.
+
+        A PDF is first written to a .part file, which is renamed once the
+        transfer is complete. Files that already exist are skipped and an
+        interrupted transfer is resumed with an HTTP range request the next
+        time this function is called.
+
+        Parameters
+        ----------
+        dois : list
+            A list of DOIs.
+        filepath : str
+            The path to store the downloaded PDFs.
+        workers : int
+            The number of PDFs downloaded at the same time.
+        per_host : int
+            The maximum number of concurrent downloads from the same host.
+        chunk_size : int
+            The number of bytes read and written at once.
+        progress : bool
+            Whether the progress of the downloads should be printed out or
+            not.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than failed downloads are reported in the result
+            instead of raising an exception.
+        backend : str or UnpywallBackend
+            The data source of the records. By default, records are looked
+            up in the cache and retrieved from Unpaywall on a miss. 'cache'
+            only uses the cache, 'remote' bypasses the cache and 'snapshot'
+            uses a local data dump.
+
+        Returns
+        -------
+        DataFrame
+            A pandas DataFrame with the doi, filename, status ('downloaded',
+            'resumed', 'skipped' or 'failed') and the number of bytes
+            transferred for each DOI. The attributes 'elapsed' and
+            'throughput' of the DataFrame hold the duration in seconds and
+            the aggregate throughput in MB/s.
+        """
+        dois = Unpywall._validate_dois(dois)
+        workers = Unpywall._validate_workers(workers)
+
+        if not isinstance(per_host, int) or per_host < 1:
+            raise ValueError('The argument per_host must be a positive'
+                             ' integer')
+
+        backend = Unpywall._get_backend(backend)
+
+        if not os.path.exists(filepath):
+            os.makedirs(filepath)
+
+        hosts = {}
+        lock = threading.Lock()
+
+        def host_limit(url):
+            host = urlparse(url).netloc
+            with lock:
+                if host not in hosts:
+                    hosts[host] = threading.BoundedSemaphore(per_host)
+                return hosts[host]
+
+        def download(doi):
+            path = os.path.join(filepath, Unpywall._pdf_filename(doi))
+            result = {'doi': doi,
+                      'filename': path,
+                      'status': 'skipped',
+                      'bytes': 0}
+
+            if os.path.exists(path):
+                return result
+
+            try:
+                url = Unpywall.get_pdf_link(doi, backend=backend)
+                if not url:
+                    raise ValueError('No PDF available for doi: {0}'.format(
+                        doi))
+                with host_limit(url):
+                    status, size = Unpywall._download_pdf(url,
+                                                          path,
+                                                          chunk_size)
+                result.update(status=status, bytes=size)
+            except Exception:
+                if errors == 'raise':
+                    raise
+                warnings.warn('Could not download doi: {}'.format(doi))
+                result['status'] = 'failed'
+
+            return result
+
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download, doi) for doi in dois]
+            for n, future in enumerate(as_completed(futures), start=1):
+                if progress:
+                    Unpywall._progress(n / len(futures))
+            results = [future.result() for future in futures]
+
+        elapsed = time.monotonic() - start
+
+        df = pd.DataFrame(results, columns=['doi', 'filename', 'status',
+                                            'bytes'])
+        df.attrs['elapsed'] = elapsed
+        df.attrs['throughput'] = (df['bytes'].sum() / 1e6 / elapsed
+                                  if elapsed > 0 else 0.0)
+
+        return df
+
+    @staticmethod
+    def _pdf_filename(doi: str) -> str:
+        return re.sub(r'[^\w.-]+', '_', doi.strip()) + '.pdf'
+
+    @staticmethod
+    def _download_pdf(url: str, path: str, chunk_size: int) -> tuple:
+        """
+        Download a PDF to path and resume a previous partial download.
+
+        Returns
+        -------
+        tuple
+            The status, either 'downloaded' or 'resumed', and the number of
+            bytes transferred.
+        """
+        part = path + '.part'
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+
+        # ranges refer to the stored bytes, so ask for an unencoded response
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = 'bytes={0}-'.format(offset)
+
+        session, rate_limiter = Unpywall._get_session()
+        rate_limiter.acquire()
+        with session.get(url, stream=True, headers=headers) as r:
+
+            if r.status_code == 416:
+                total = r.headers.get('Content-Range', '').rpartition('/')[2]
+                if total == str(offset):
+                    # the previous download was complete
+                    os.replace(part, path)
+                    return 'resumed', 0
+                os.remove(part)
+                return Unpywall._download_pdf(url, path, chunk_size)
+
+            r.raise_for_status()
+
+            if r.status_code != 206:
+                # the server ignored the range and sends the whole file
+                offset = 0
+
+            expected = r.headers.get('Content-Length')
+            size = 0
+
+            with open(part, 'ab' if offset else 'wb') as file:
+                for chunk in r.iter_content(chunk_size):
+                    file.write(chunk)
+                    size += len(chunk)
+
+        if expected is not None and size < int(expected):
+            raise IOError('Incomplete download of {0}'.format(url))
+
+        os.replace(part, path)
+
+        return ('resumed' if offset else 'downloaded'), size
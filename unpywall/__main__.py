@@ -1,9 +1,16 @@
 from argparse import ArgumentParser, RawTextHelpFormatter, SUPPRESS
 import textwrap
 import uuid
+import csv
+import json
+import glob
+import os
 import sys
 
+import pandas as pd
+
 from unpywall import Unpywall
+from unpywall.cache import UnpywallCache
 
 
 class UnpywallArgumentParser(ArgumentParser):
@@ -32,6 +39,8 @@ class main:
                                 given DOI.
                     link        This command returns a link to an OA pdf
                                 (if available).
+                    batch       This command resolves a file of DOIs to CSV,
+                                JSONL or Parquet.
                                       """)
         ap = UnpywallArgumentParser(prog='unpywall',
                                     usage=usage,
@@ -58,6 +67,12 @@ class main:
     def __repr__(self) -> None:
         return None
 
+    @staticmethod
+    def _init_backend(args) -> str:
+        if args.backend == 'snapshot':
+            Unpywall.init_snapshot(args.snapshot)
+        return args.backend
+
     def view(self) -> None:
         ap = UnpywallArgumentParser(description=('This command opens a local'
                                                  ' copy of a PDF from a'
@@ -79,11 +94,21 @@ class main:
         ap.add_argument('-b',
                         '--backend',
                         type=str,
-                        default='remote',
                         dest='backend',
                         choices=['remote', 'cache', 'snapshot'],
                         metavar='\b',
-                        help='\tThe backend you want to use.')
+                        help=('\tThe backend you want to use: remote'
+                              ' (Unpaywall API), cache (cached records only)'
+                              ' or snapshot (local data dump). By default,'
+                              ' records are looked up in the cache and'
+                              ' retrieved from Unpaywall on a miss.'))
+        ap.add_argument('-s',
+                        '--snapshot',
+                        type=str,
+                        dest='snapshot',
+                        metavar='\b',
+                        help=('\tThe path of an Unpaywall data dump used by'
+                              ' the snapshot backend.'))
         ap.add_argument('-u',
                         '--progress',
                         type=bool,
@@ -102,7 +127,10 @@ class main:
         else:
             args = ap.parse_args(sys.argv[2:])
 
-        Unpywall.view_pdf(args.doi, args.mode, progress=args.progress)
+        Unpywall.view_pdf(args.doi,
+                          args.mode,
+                          progress=args.progress,
+                          backend=self._init_backend(args))
 
     def download(self) -> None:
         ap = UnpywallArgumentParser(description=('This command downloads a'
@@ -112,8 +140,38 @@ class main:
                                     add_help=False)
         ap.add_argument('doi',
                         type=str,
+                        nargs='*',
                         metavar='doi',
-                        help='\tThe DOI of the document.')
+                        help=('\tThe DOI of the document. Several DOIs are'
+                              ' downloaded concurrently.'))
+        ap.add_argument('-i',
+                        '--input',
+                        type=str,
+                        dest='input',
+                        metavar='\b',
+                        help=('\tA file with one DOI per line to download'
+                              ' concurrently.'))
+        ap.add_argument('-w',
+                        '--workers',
+                        type=int,
+                        default=4,
+                        dest='workers',
+                        metavar='\b',
+                        help=('\tThe number of PDFs downloaded at the same'
+                              ' time.'))
+        ap.add_argument('--per-host',
+                        type=int,
+                        default=2,
+                        dest='per_host',
+                        metavar='\b',
+                        help=('\tThe maximum number of concurrent downloads'
+                              ' from the same host.'))
+        ap.add_argument('--chunk-size',
+                        type=int,
+                        default=1024 * 1024,
+                        dest='chunk_size',
+                        metavar='\b',
+                        help='\tThe number of bytes written at once.')
         ap.add_argument('-f',
                         '--filename',
                         type=str,
@@ -130,11 +188,21 @@ class main:
         ap.add_argument('-b',
                         '--backend',
                         type=str,
-                        default='remote',
                         dest='backend',
                         choices=['remote', 'cache', 'snapshot'],
                         metavar='\b',
-                        help='\tThe backend you want to use.')
+                        help=('\tThe backend you want to use: remote'
+                              ' (Unpaywall API), cache (cached records only)'
+                              ' or snapshot (local data dump). By default,'
+                              ' records are looked up in the cache and'
+                              ' retrieved from Unpaywall on a miss.'))
+        ap.add_argument('-s',
+                        '--snapshot',
+                        type=str,
+                        dest='snapshot',
+                        metavar='\b',
+                        help=('\tThe path of an Unpaywall data dump used by'
+                              ' the snapshot backend.'))
         ap.add_argument('-u',
                         '--progress',
                         type=bool,
@@ -153,13 +221,39 @@ class main:
         else:
             args = ap.parse_args(sys.argv[2:])
 
+        dois = list(args.doi)
+        if args.input:
+            with open(args.input) as source:
+                dois += [doi.strip() for doi in source if doi.strip()]
+
+        if not dois:
+            ap.error('the following arguments are required: doi')
+
+        if len(dois) > 1 or args.input:
+            df = Unpywall.download_pdf_files(dois,
+                                             filepath=args.filepath,
+                                             workers=args.workers,
+                                             per_host=args.per_host,
+                                             chunk_size=args.chunk_size,
+                                             progress=args.progress,
+                                             backend=self._init_backend(args))
+            counts = df['status'].value_counts()
+            print('{0} files downloaded, {1} resumed, {2} skipped, {3} failed'
+                  ' ({4:.2f} MB/s).'.format(counts.get('downloaded', 0),
+                                            counts.get('resumed', 0),
+                                            counts.get('skipped', 0),
+                                            counts.get('failed', 0),
+                                            df.attrs['throughput']))
+            return
+
         try:
             if not args.filename:
                 args.filename = '{0}.pdf'.format(uuid.uuid4().hex)
-            Unpywall.download_pdf_file(args.doi,
+            Unpywall.download_pdf_file(dois[0],
                                        filename=args.filename,
                                        filepath=args.filepath,
-                                       progress=args.progress)
+                                       progress=args.progress,
+                                       backend=self._init_backend(args))
             print('File was successfully downloaded.')
         except Exception:
             print('Could not download file.')
@@ -177,11 +271,21 @@ class main:
         ap.add_argument('-b',
                         '--backend',
                         type=str,
-                        default='remote',
                         dest='backend',
                         choices=['remote', 'cache', 'snapshot'],
                         metavar='\b',
-                        help='\tThe backend you want to use.')
+                        help=('\tThe backend you want to use: remote'
+                              ' (Unpaywall API), cache (cached records only)'
+                              ' or snapshot (local data dump). By default,'
+                              ' records are looked up in the cache and'
+                              ' retrieved from Unpaywall on a miss.'))
+        ap.add_argument('-s',
+                        '--snapshot',
+                        type=str,
+                        dest='snapshot',
+                        metavar='\b',
+                        help=('\tThe path of an Unpaywall data dump used by'
+                              ' the snapshot backend.'))
         ap.add_argument('-h',
                         '--help',
                         action='help',
@@ -193,7 +297,303 @@ class main:
         else:
             args = ap.parse_args(sys.argv[2:])
 
-        print(Unpywall.get_pdf_link(args.doi))
+        print(Unpywall.get_pdf_link(args.doi,
+                                    backend=self._init_backend(args)))
+
+    def batch(self) -> None:
+        ap = UnpywallArgumentParser(description=('This command resolves a'
+                                                 ' file of DOIs to CSV, JSONL'
+                                                 ' or Parquet.'),
+                                    formatter_class=RawTextHelpFormatter,
+                                    add_help=False)
+        ap.add_argument('-i',
+                        '--input',
+                        type=str,
+                        default='-',
+                        dest='input',
+                        metavar='\b',
+                        help=('\tA file with one DOI per line. DOIs are read'
+                              ' from stdin by default.'))
+        ap.add_argument('-o',
+                        '--output',
+                        type=str,
+                        default='-',
+                        dest='output',
+                        metavar='\b',
+                        help=('\tThe output file or, for parquet, the output'
+                              ' directory. Results are written to stdout by'
+                              ' default.'))
+        ap.add_argument('-f',
+                        '--format',
+                        type=str,
+                        dest='format',
+                        choices=['csv', 'jsonl', 'parquet'],
+                        metavar='\b',
+                        help=('\tThe output format: csv, jsonl or parquet.'
+                              ' By default, the format is derived from the'
+                              ' output filename.'))
+        ap.add_argument('-t',
+                        '--table',
+                        type=str,
+                        default='raw',
+                        dest='table',
+                        choices=['raw', 'extended'],
+                        metavar='\b',
+                        help=('\tThe format of the table for csv: raw or'
+                              ' extended. Parquet uses the nested schema of'
+                              ' the Unpaywall record.'))
+        ap.add_argument('-r',
+                        '--resume',
+                        action='store_true',
+                        dest='resume',
+                        help=('\tAppend to the output and skip DOIs that are'
+                              ' already in it.'))
+        ap.add_argument('-w',
+                        '--workers',
+                        type=int,
+                        default=1,
+                        dest='workers',
+                        metavar='\b',
+                        help='\tThe number of threads used to retrieve DOIs.')
+        ap.add_argument('-n',
+                        '--chunk-size',
+                        type=int,
+                        default=1000,
+                        dest='chunk_size',
+                        metavar='\b',
+                        help='\tThe number of records written at once.')
+        ap.add_argument('-c',
+                        '--cache',
+                        type=str,
+                        dest='cache',
+                        metavar='\b',
+                        help=('\tThe path of the cache. New caches use sqlite'
+                              ' storage.'))
+        ap.add_argument('-b',
+                        '--backend',
+                        type=str,
+                        dest='backend',
+                        choices=['remote', 'cache', 'snapshot'],
+                        metavar='\b',
+                        help=('\tThe backend you want to use: remote'
+                              ' (Unpaywall API), cache (cached records only)'
+                              ' or snapshot (local data dump). By default,'
+                              ' records are looked up in the cache and'
+                              ' retrieved from Unpaywall on a miss.'))
+        ap.add_argument('-s',
+                        '--snapshot',
+                        type=str,
+                        dest='snapshot',
+                        metavar='\b',
+                        help=('\tThe path of an Unpaywall data dump used by'
+                              ' the snapshot backend.'))
+        ap.add_argument('-h',
+                        '--help',
+                        action='help',
+                        default=SUPPRESS,
+                        help=SUPPRESS)
+
+        if self.test_args:
+            args = ap.parse_args(self.test_args[1:])
+        else:
+            args = ap.parse_args(sys.argv[2:])
+
+        if not args.format:
+            extension = os.path.splitext(args.output)[1].lstrip('.')
+            args.format = extension if extension in ('jsonl',
+                                                     'parquet') else 'csv'
+
+        if args.output == '-' and (args.format == 'parquet' or args.resume):
+            ap.error('parquet output and --resume require --output')
+
+        # a long batch writes many entries, so new caches use sqlite storage
+        # which does not rewrite the whole file on every entry
+        if args.backend not in ('remote', 'snapshot'):
+            cache = args.cache or os.path.join(os.getcwd(), 'unpaywall_cache')
+            Unpywall.init_cache(UnpywallCache(
+                cache, storage=None if os.path.exists(cache) else 'sqlite'))
+
+        done = self._done(args.output, args.format) if args.resume else set()
+
+        source = sys.stdin if args.input == '-' else open(args.input)
+        try:
+            dois = (doi for doi in source if doi.strip().lower() not in done)
+            options = dict(errors='ignore',
+                           workers=args.workers,
+                           backend=self._init_backend(args))
+
+            if args.format == 'jsonl':
+                n = self._write_jsonl(args, dois, options)
+            elif args.format == 'csv':
+                n = self._write_csv(args, dois, options)
+            else:
+                n = self._write_parquet(args, dois, options)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        print('{0} records written, {1} skipped.'.format(n, len(done)),
+              file=sys.stderr)
+
+    @staticmethod
+    def _open(args):
+        if args.output == '-':
+            return sys.stdout
+        return open(args.output, 'a' if args.resume else 'w', newline='')
+
+    @staticmethod
+    def _write_jsonl(args, dois, options) -> int:
+        n = 0
+        out = main._open(args)
+        try:
+            for record in Unpywall.iter_json(dois, **options):
+                out.write(json.dumps(record) + '\n')
+                n += 1
+                if n % args.chunk_size == 0:
+                    out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return n
+
+    @staticmethod
+    def _write_csv(args, dois, options) -> int:
+        columns = None
+        if (args.resume and os.path.exists(args.output)
+                and os.path.getsize(args.output) > 0):
+            columns = list(pd.read_csv(args.output, nrows=0).columns)
+
+        n = 0
+        out = main._open(args)
+        try:
+            for df in Unpywall.iter_doi(dois,
+                                        chunk_size=args.chunk_size,
+                                        format=args.table,
+                                        **options):
+                # all rows of a CSV file share the header of the first chunk
+                header = columns is None
+                if header:
+                    columns = list(df.columns)
+                df.reindex(columns=columns).to_csv(out,
+                                                   header=header,
+                                                   index=False)
+                out.flush()
+                n += len(df)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return n
+
+    @staticmethod
+    def _write_parquet(args, dois, options) -> int:
+        os.makedirs(args.output, exist_ok=True)
+        parts = main._parts(args.output)
+        if not args.resume:
+            for part in parts:
+                os.remove(part)
+            parts = []
+
+        from unpywall.arrow import UnpywallArrow
+
+        # all parts share the declared schema, so the directory can be read
+        # as one dataset
+        n = 0
+        for number, table in enumerate(Unpywall.iter_doi(
+                dois, chunk_size=args.chunk_size, format='arrow',
+                **options), start=len(parts)):
+            part = os.path.join(args.output,
+                                'part-{0:05d}.parquet'.format(number))
+            # write to a temporary file first, so an interrupted batch does
+            # not leave a broken part behind
+            with UnpywallArrow.writer(part + '.tmp') as writer:
+                writer.write_table(table)
+            os.replace(part + '.tmp', part)
+            n += len(table)
+        return n
+
+    @staticmethod
+    def _parts(path: str) -> list:
+        return sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+
+    @staticmethod
+    def _done(output: str, format: str) -> set:
+        """
+        Return the lowercase DOIs that are already in the output.
+        """
+        if not os.path.exists(output):
+            return set()
+
+        if format == 'parquet':
+            return {doi.lower() for part in main._parts(output)
+                    for doi in pd.read_parquet(part, columns=['doi'])['doi']}
+
+        main._truncate(output)
+
+        if format == 'csv':
+            return main._done_csv(output)
+
+        with open(output) as handle:
+            return {json.loads(line)['doi'].lower()
+                    for line in handle if line.strip()}
+
+    @staticmethod
+    def _done_csv(output: str) -> set:
+        """
+        Return the lowercase DOIs that are already in a CSV output and remove
+        the rows of the last DOI. In the extended table a DOI spans several
+        rows, so an interrupted batch may have written only some of them. The
+        last DOI is therefore retrieved again.
+        """
+        with open(output, 'rb+') as handle:
+            position = 0
+
+            def lines():
+                nonlocal position
+                for line in handle:
+                    position += len(line)
+                    yield line.decode('utf-8')
+
+            reader = csv.reader(lines())
+            header = next(reader, None)
+            if header is None:
+                return set()
+            column = header.index('doi')
+
+            dois = []
+            start = end = position
+            for row in reader:
+                if len(row) <= column:
+                    continue
+                if not dois or row[column] != dois[-1]:
+                    dois.append(row[column])
+                    start = end
+                end = position
+
+            if dois:
+                dois.pop()
+                handle.truncate(start)
+
+        return {doi.lower() for doi in dois if doi}
+
+    @staticmethod
+    def _truncate(output: str) -> None:
+        """
+        Remove an incomplete last line left behind by an interrupted batch.
+        """
+        with open(output, 'rb+') as handle:
+            end = handle.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(65536, position)
+                handle.seek(position - step)
+                block = handle.read(step)
+                newline = block.rfind(b'\n')
+                if newline != -1:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position != end:
+                handle.truncate(position)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,430 @@
+import asyncio
+import functools
+import os
+import warnings
+
+import pandas as pd
+from urllib3.exceptions import InvalidHeader, MaxRetryError
+
+try:
+    import aiohttp
+    from multidict import CIMultiDict, CIMultiDictProxy
+    from yarl import URL
+except ImportError:  # pragma: no cover
+    raise ImportError('AsyncUnpywall requires aiohttp. Install it with'
+                      ' "pip install unpywall[async]".')
+
+from . import Unpywall
+from .cache import UnpywallCache, UnpywallRecord
+from .utils import UnpywallURL
+
+
+class AsyncUnpywall:
+    """
+    Asynchronous client for the Unpaywall REST API for use in asyncio
+    applications. It mirrors the methods of Unpywall as coroutines. Requests
+    are sent with aiohttp, waiting for the rate limiter does not block the
+    event loop, and reads and writes of the cache run in a thread pool.
+
+    The client should be used as an asynchronous context manager, so its
+    connections are closed:
+
+        async with AsyncUnpywall() as client:
+            df = await client.doi(dois)
+
+    Attributes
+    ----------
+    cache : UnpywallCache
+        The cache used to store records. The rate limiter of the cache is
+        shared with Unpywall, so both clients stay within one rate budget.
+    limit : int
+        The maximum number of open connections.
+    timeout : float or tuple
+        The timeout in seconds to connect and to wait for data. A tuple sets
+        the connect and read timeouts separately. By default, the timeouts of
+        the session of the cache are used.
+    """
+
+    def __init__(self,
+                 cache: UnpywallCache = None,
+                 limit: int = 100,
+                 timeout=None) -> None:
+
+        if cache is None:
+            if not Unpywall.cache:
+                Unpywall.init_cache()
+            cache = Unpywall.cache
+
+        if not isinstance(cache, UnpywallCache):
+            raise AttributeError('Cache is not of type {0}'.format(
+                UnpywallCache))
+
+        self.cache = cache
+        self.limit = limit
+        self.timeout = (timeout if timeout is not None
+                        else cache.session.timeout)
+        self._session = None
+
+    def __repr__(self) -> str:
+        return 'AsyncUnpywall(cache={0}, limit={1})'.format(
+            self.cache.name, self.limit)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Close all open connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # the session is bound to the running event loop, so it is created
+        # on the first request
+        if self._session is None:
+            if isinstance(self.timeout, tuple):
+                connect, read = self.timeout
+            else:
+                connect = read = self.timeout
+            connector = aiohttp.TCPConnector(limit=self.limit)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None,
+                                              sock_connect=connect,
+                                              sock_read=read))
+        return self._session
+
+    @staticmethod
+    async def _run(func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func,
+                                                                  *args,
+                                                                  **kwargs))
+
+    async def _wait(self) -> None:
+        wait = self.cache.rate_limiter.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def _increment(retry, url: str, error=None, retry_after: str = None):
+        # returns the next retry and the seconds to wait before it, or None
+        # if no retries are left
+        try:
+            retry = retry.increment('GET', url, error=error)
+        except MaxRetryError:
+            return None, None
+
+        if retry_after is not None:
+            try:
+                return retry, retry.parse_retry_after(retry_after)
+            except InvalidHeader:
+                pass
+        return retry, retry.get_backoff_time()
+
+    async def _download(self,
+                        url: str,
+                        errors: str,
+                        message: str,
+                        doi: str = None) -> bytes:
+        # failed connections, timeouts, rate limiting and server errors are
+        # retried like the requests of the session of the cache
+        retry = self.cache.session.retry
+
+        while True:
+            await self._wait()
+
+            try:
+                async with self._get_session().get(url) as r:
+                    retry_after = r.headers.get('Retry-After')
+                    if r.status not in retry.RETRY_AFTER_STATUS_CODES:
+                        retry_after = None
+
+                    wait = None
+                    if retry.is_retry('GET',
+                                      r.status,
+                                      retry_after is not None):
+                        retry, wait = self._increment(retry,
+                                                      url,
+                                                      retry_after=retry_after)
+                    if wait is None:
+                        r.raise_for_status()
+                        return await r.read()
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                retry, wait = self._increment(retry, url, error=e)
+                if wait is None:
+                    if errors == 'raise':
+                        raise
+                    break
+
+            # invalid DOI
+            except aiohttp.ClientError as e:
+                if doi and isinstance(e, aiohttp.ClientResponseError):
+                    await self._run(self.cache._remember_failure,
+                                    doi,
+                                    e.status)
+                if errors == 'raise':
+                    raise
+                break
+
+            await asyncio.sleep(wait)
+
+        warnings.warn(message)
+        return None
+
+    @staticmethod
+    def _fail(doi: str, status: int, errors: str):
+        # raise or warn about a DOI that failed within the failure_timeout
+        # of the cache without sending a new request
+        if errors == 'raise':
+            url = URL(UnpywallURL(doi=doi).doi_url)
+            headers = CIMultiDictProxy(CIMultiDict())
+            raise aiohttp.ClientResponseError(
+                aiohttp.RequestInfo(url, 'GET', headers),
+                (),
+                status=status,
+                message='Failed within failure_timeout')
+
+        warnings.warn('Could not download doi: {}'.format(doi))
+        return None
+
+    async def get_json(self,
+                       doi: str = None,
+                       query: str = None,
+                       is_oa: bool = False,
+                       errors: str = 'raise',
+                       force: bool = False,
+                       ignore_cache: bool = False):
+        """
+        This function returns all information in Unpaywall about the given
+        DOI or query.
+
+        Parameters
+        ----------
+        doi : str or list
+            The DOI of the requested paper. A list of DOIs is retrieved
+            concurrently and returns a list of records.
+        query : str
+            The text to search for.
+        is_oa : bool
+            A boolean value indicating whether the returned records should be
+            Open Access or not.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than errors will not raise an exception.
+        force : bool
+            Whether to force the cache to retrieve a new entry.
+        ignore_cache : bool
+            Whether to use or ignore the cache.
+
+        Returns
+        -------
+        JSON object
+            A JSON data structure containing all information
+            returned by Unpaywall about the given DOI or query.
+        """
+        if isinstance(doi, list):
+            dois = Unpywall._validate_dois(doi)
+            return list(await asyncio.gather(
+                *[self.get_json(doi,
+                                errors=errors,
+                                force=force,
+                                ignore_cache=ignore_cache) for doi in dois]))
+
+        if doi:
+            if not ignore_cache and not force:
+                record = await self._run(self.cache.lookup, doi)
+                if record is not None:
+                    return record
+
+                failure = await self._run(self.cache.failed, doi)
+                if failure is not None:
+                    self.cache._count('failures')
+                    return self._fail(doi, failure[0], errors)
+
+            content = await self._download(
+                UnpywallURL(doi=doi).doi_url,
+                errors,
+                'Could not download doi: {}'.format(doi),
+                doi=doi)
+
+            if content is None:
+                return None
+            if ignore_cache:
+                return UnpywallRecord.loads(content)
+            return await self._run(self.cache.put, doi, content)
+
+        if query:
+            if type(is_oa) is not bool:
+                raise ValueError('The argument is_oa only accepts the'
+                                 ' values "True" and "False"')
+
+            content = await self._download(
+                UnpywallURL(query=query, is_oa=is_oa).query_url,
+                errors,
+                'Could not run query: {}'.format(query))
+
+            if content is not None:
+                return UnpywallRecord.loads(content)
+
+        return None
+
+    async def doi(self,
+                  dois: list,
+                  format: str = 'raw',
+                  errors: str = 'raise',
+                  force: bool = False,
+                  ignore_cache: bool = False):
+        """
+        Parses information for the given DOIs from the Unpaywall API service
+        and returns it as a pandas DataFrame. The DOIs are retrieved
+        concurrently.
+
+        Parameters
+        ----------
+        dois : list
+            A list of DOIs.
+        format: str
+            The format of the DataFrame: 'raw', 'extended', 'normalized' or
+            'arrow'. 'normalized' returns an UnpywallTables object with the
+            records, OA locations and authors as separate tables. 'arrow'
+            returns a pyarrow Table with a declared schema.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than errors will not raise an exception.
+        force : bool
+            Whether to force the cache to retrieve a new entry.
+        ignore_cache : bool
+            Whether to use or ignore the cache.
+
+        Returns
+        -------
+        DataFrame
+            A pandas DataFrame that contains information from the Unpaywall
+            API service.
+        """
+        records = await self.get_json(Unpywall._validate_dois(dois),
+                                      errors=errors,
+                                      force=force,
+                                      ignore_cache=ignore_cache)
+
+        records = [record for record in records if record]
+
+        if not records:
+            return None
+
+        df = Unpywall._get_df(data=records, format=format, errors=errors)
+
+        if len(df) == 0:
+            return None
+
+        return df
+
+    async def query(self,
+                    query: str,
+                    is_oa: bool = False,
+                    format: str = 'raw',
+                    errors: str = 'raise') -> pd.DataFrame:
+        """
+        Parses information for a given query from the Unpaywall API service and
+        returns it as a pandas DataFrame.
+
+        Parameters
+        ----------
+        query : str
+            The text to search for.
+        is_oa : bool
+            A boolean value indicating whether the returned records should be
+            Open Access or not.
+        format: str
+            The format of the DataFrame: 'raw', 'extended', 'normalized' or
+            'arrow'. 'normalized' returns an UnpywallTables object with the
+            records, OA locations and authors as separate tables. 'arrow'
+            returns a pyarrow Table with a declared schema.
+        errors : str
+            Either 'raise' or 'ignore'. If the parameter errors is set to
+            'ignore' than errors will not raise an exception.
+
+        Returns
+        -------
+        DataFrame
+            A pandas DataFrame that contains information from the Unpaywall
+            API service.
+        """
+        data = await self.get_json(query=query, is_oa=is_oa, errors=errors)
+
+        if not data:
+            return None
+
+        records = [obj['response'] for obj in data['results']]
+
+        if not records:
+            return None
+
+        df = Unpywall._get_df(data=records, format=format, errors=errors)
+
+        if len(df) == 0:
+            return None
+
+        return df
+
+    async def get_pdf_link(self, doi: str) -> str:
+        """
+        This function returns a link to an OA pdf (if available).
+
+        Parameters
+        ----------
+        doi: str
+            The DOI of the requested paper.
+
+        Returns
+        -------
+        str
+            The URL of an OA PDF (if available).
+        """
+        return Unpywall._get_links(await self.get_json(doi))['pdf_link']
+
+    async def download_pdf_file(self,
+                                doi: str,
+                                filename: str,
+                                filepath: str = '.',
+                                chunk_size: int = 1024 * 1024) -> None:
+        """
+        This function downloads a PDF from a given DOI.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI of the requested paper.
+        filename : str
+            The filename for the PDF.
+        filepath : str
+            The path to store the downloaded PDF.
+        chunk_size : int
+            The number of bytes read and written at once.
+
+        Raises
+        ------
+        ValueError
+            If no PDF is available for the DOI.
+        """
+        url = await self.get_pdf_link(doi)
+        if not url:
+            raise ValueError('No PDF available for doi: {0}'.format(doi))
+
+        if not os.path.exists(filepath):
+            os.makedirs(filepath)
+
+        await self._wait()
+
+        async with self._get_session().get(url) as r:
+            r.raise_for_status()
+            with open(os.path.join(filepath, filename), 'wb') as file:
+                async for chunk in r.content.iter_chunked(chunk_size):
+                    await self._run(file.write, chunk)
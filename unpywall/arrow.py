@@ -0,0 +1,164 @@
+from datetime import date, datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    raise ImportError('Arrow and Parquet output require pyarrow. Install it'
+                      ' with "pip install unpywall[arrow]".')
+
+
+class UnpywallArrow:
+    """
+    This class converts records from Unpaywall into pyarrow Tables with a
+    declared schema of the Unpaywall v2 record
+    (https://unpaywall.org/data-format). Booleans, dates and timestamps are
+    typed, oa_status is dictionary encoded, and OA locations and authors are
+    kept as nested lists. Keys that are not part of the schema are dropped
+    and dates that cannot be parsed are null.
+
+    Attributes
+    ----------
+    location : pyarrow.StructType
+        The type of an OA location.
+    author : pyarrow.StructType
+        The type of an author in z_authors.
+    schema : pyarrow.Schema
+        The schema of a record.
+    """
+
+    location = pa.struct([
+        ('endpoint_id', pa.string()),
+        ('evidence', pa.string()),
+        ('host_type', pa.dictionary(pa.int8(), pa.string())),
+        ('is_best', pa.bool_()),
+        ('license', pa.string()),
+        ('oa_date', pa.date32()),
+        ('pmh_id', pa.string()),
+        ('repository_institution', pa.string()),
+        ('updated', pa.timestamp('us')),
+        ('url', pa.string()),
+        ('url_for_landing_page', pa.string()),
+        ('url_for_pdf', pa.string()),
+        ('version', pa.dictionary(pa.int8(), pa.string()))])
+
+    author = pa.struct([
+        ('family', pa.string()),
+        ('given', pa.string()),
+        ('sequence', pa.string()),
+        ('ORCID', pa.string()),
+        ('authenticated-orcid', pa.bool_())])
+
+    schema = pa.schema([
+        ('doi', pa.string()),
+        ('doi_url', pa.string()),
+        ('title', pa.string()),
+        ('genre', pa.dictionary(pa.int8(), pa.string())),
+        ('is_paratext', pa.bool_()),
+        ('published_date', pa.date32()),
+        ('year', pa.int16()),
+        ('journal_name', pa.string()),
+        ('journal_issns', pa.string()),
+        ('journal_issn_l', pa.string()),
+        ('journal_is_oa', pa.bool_()),
+        ('journal_is_in_doaj', pa.bool_()),
+        ('publisher', pa.string()),
+        ('is_oa', pa.bool_()),
+        ('oa_status', pa.dictionary(pa.int8(), pa.string())),
+        ('has_repository_copy', pa.bool_()),
+        ('best_oa_location', location),
+        ('first_oa_location', location),
+        ('oa_locations', pa.list_(location)),
+        ('oa_locations_embargoed', pa.list_(location)),
+        ('updated', pa.timestamp('us')),
+        ('data_standard', pa.int8()),
+        ('z_authors', pa.list_(author))])
+
+    @staticmethod
+    def _converter(type):
+        """
+        Return a function that converts a JSON value into a value that
+        pyarrow accepts for the given type.
+        """
+        if pa.types.is_struct(type):
+            fields = [(type.field(n).name,
+                       UnpywallArrow._converter(type.field(n).type))
+                      for n in range(type.num_fields)]
+
+            def convert(value):
+                if not isinstance(value, dict):
+                    return None
+                return {name: converter(value.get(name))
+                        for name, converter in fields}
+            return convert
+
+        if pa.types.is_list(type):
+            item = UnpywallArrow._converter(type.value_type)
+
+            def convert(value):
+                if not isinstance(value, list):
+                    return None
+                return [item(v) for v in value]
+            return convert
+
+        if pa.types.is_date(type):
+            return UnpywallArrow._parse(
+                lambda value: date.fromisoformat(value[:10]))
+
+        if pa.types.is_timestamp(type):
+            return UnpywallArrow._parse(datetime.fromisoformat)
+
+        return lambda value: value
+
+    @staticmethod
+    def _parse(parser):
+        def convert(value):
+            if not value:
+                return None
+            try:
+                return parser(value)
+            except (TypeError, ValueError):
+                return None
+        return convert
+
+    @staticmethod
+    def to_table(data: list) -> pa.Table:
+        """
+        Convert records from Unpaywall into a pyarrow Table.
+
+        Parameters
+        ----------
+        data : list
+            A list of JSON records.
+
+        Returns
+        -------
+        pyarrow.Table
+            One row per record with the schema UnpywallArrow.schema.
+        """
+        convert = UnpywallArrow._convert
+        return pa.Table.from_pylist([convert(obj) for obj in data],
+                                    schema=UnpywallArrow.schema)
+
+    @staticmethod
+    def writer(path: str) -> pq.ParquetWriter:
+        """
+        Open a Parquet file with the schema of the record. Each Table
+        written to it becomes a row group.
+
+        Parameters
+        ----------
+        path : str
+            The path of the Parquet file.
+
+        Returns
+        -------
+        pyarrow.parquet.ParquetWriter
+            The writer, which has to be closed after the last Table.
+        """
+        return pq.ParquetWriter(path, UnpywallArrow.schema)
+
+
+# the converter of a record is built once from the schema
+UnpywallArrow._convert = UnpywallArrow._converter(
+    pa.struct(list(UnpywallArrow.schema)))
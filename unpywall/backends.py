@@ -0,0 +1,161 @@
+import requests
+import warnings
+from abc import ABC, abstractmethod
+
+from .utils import UnpywallURL, UnpywallRateLimiter, UnpywallSession
+
+
+class UnpywallBackend(ABC):
+    """
+    Base class for the data sources that Unpywall looks up records in.
+    A backend only has to implement get. Custom backends can be passed to
+    every method of Unpywall that accepts the backend argument.
+    """
+
+    @abstractmethod
+    def get(self, doi: str, errors: str = 'raise',
+            force: bool = False, ignore_cache: bool = False):
+        """
+        Return the record for the given doi.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI to be retrieved.
+        errors : str
+            Whether to ignore or raise errors.
+        force : bool
+            Whether to force the backend to retrieve a new entry.
+        ignore_cache : bool
+            Whether to use or ignore a cache of the backend.
+
+        Returns
+        -------
+        record : UnpywallRecord
+            The JSON record or None if errors is 'ignore' and the record
+            could not be retrieved.
+        """
+
+
+class UnpywallCacheBackend(UnpywallBackend):
+    """
+    This backend only returns records that are already in the cache and
+    never contacts Unpaywall.
+
+    Attributes
+    ----------
+    cache : UnpywallCache
+        The cache to look records up in.
+    """
+
+    def __init__(self, cache) -> None:
+        self.cache = cache
+
+    def __repr__(self) -> str:
+        return 'UnpywallCacheBackend(cache={0})'.format(self.cache.name)
+
+    def get(self, doi: str, errors: str = 'raise',
+            force: bool = False, ignore_cache: bool = False):
+        """
+        Return the cached record for the given doi.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI to be retrieved.
+        errors : str
+            Whether to ignore or raise errors.
+        force : bool
+            Ignored, the cache backend never retrieves new entries.
+        ignore_cache : bool
+            Ignored, the cache backend always uses the cache.
+
+        Returns
+        -------
+        record : UnpywallRecord
+            The JSON record from the cache.
+
+        Raises
+        ------
+        KeyError
+            If the DOI is not cached or has expired and errors is 'raise'.
+        """
+        record = self.cache.lookup(doi)
+
+        if record is None:
+            if errors == 'raise':
+                raise KeyError('DOI not found in cache: {0}'.format(doi))
+            warnings.warn('Could not find doi: {}'.format(doi))
+
+        return record
+
+
+class UnpywallRemoteBackend(UnpywallBackend):
+    """
+    This backend retrieves every record from Unpaywall and bypasses the
+    cache, which is neither loaded nor updated.
+
+    Attributes
+    ----------
+    session : UnpywallSession
+        The HTTP session used for all requests.
+    rate_limiter : UnpywallRateLimiter
+        The rate limiter that all requests pass.
+    """
+
+    def __init__(self, session=None, rate_limiter=None) -> None:
+        """
+        Create a remote backend.
+
+        Parameters
+        ----------
+        session : UnpywallSession
+            The HTTP session. If None, a new session is created.
+        rate_limiter : UnpywallRateLimiter
+            The rate limiter, for example the one of a cache so that both
+            share one rate budget. If None, a new rate limiter is created.
+        """
+        self.session = session if session else UnpywallSession()
+        self.rate_limiter = (rate_limiter if rate_limiter
+                             else UnpywallRateLimiter())
+
+    def __repr__(self) -> str:
+        return 'UnpywallRemoteBackend()'
+
+    def get(self, doi: str, errors: str = 'raise',
+            force: bool = False, ignore_cache: bool = False):
+        """
+        Retrieve the record for the given doi from Unpaywall.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI to be retrieved.
+        errors : str
+            Whether to ignore or raise errors.
+        force : bool
+            Ignored, records are always retrieved from Unpaywall.
+        ignore_cache : bool
+            Ignored, the cache is always bypassed.
+
+        Returns
+        -------
+        record : UnpywallRecord
+            The JSON record from Unpaywall.
+        """
+        from .cache import UnpywallRecord
+
+        self.rate_limiter.acquire()
+
+        try:
+            r = self.session.get(UnpywallURL(doi=doi).doi_url)
+            r.raise_for_status()
+            return UnpywallRecord.loads(r.content)
+
+        # invalid DOI, bad internet connection or server is down
+        except requests.exceptions.RequestException:
+            if errors == 'raise':
+                raise
+
+        warnings.warn('Could not download doi: {}'.format(doi))
+        return None
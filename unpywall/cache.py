@@ -1,12 +1,267 @@
 import requests
+import json
 import pickle
-from copy import deepcopy
+import sqlite3
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+import heapq
+import itertools
 import os
+import queue
+import threading
 import time
 import warnings
 
+from .backends import UnpywallBackend
 
-class UnpywallCache:
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+
+class UnpywallRecord(dict):
+    """
+    This class provides a read-only JSON record. Nested objects and lists are
+    read-only as well, so a record can be handed out to many callers without
+    copying it. copy.deepcopy returns a modifiable copy.
+    """
+
+    def __init__(self, data=()) -> None:
+        super().__init__((key, UnpywallRecord.freeze(value))
+                         for key, value in dict(data).items())
+
+    @staticmethod
+    def freeze(value):
+        """
+        Return a read-only version of a JSON value.
+
+        Parameters
+        ----------
+        value : JSON object
+            A dict, list or scalar JSON value.
+
+        Returns
+        -------
+        JSON object
+            The value with all dicts and lists replaced by read-only versions.
+        """
+        if isinstance(value, UnpywallRecord):
+            return value
+        if isinstance(value, dict):
+            return UnpywallRecord(value)
+        if isinstance(value, list) and not isinstance(value,
+                                                      UnpywallRecordList):
+            return UnpywallRecordList(value)
+        return value
+
+    @staticmethod
+    def loads(data: bytes) -> 'UnpywallRecord':
+        """
+        Parse raw JSON directly into a read-only record.
+
+        Parameters
+        ----------
+        data : bytes
+            The raw JSON record.
+
+        Returns
+        -------
+        UnpywallRecord
+            The parsed record.
+        """
+        return json.loads(data, object_hook=UnpywallRecord._from_object)
+
+    @staticmethod
+    def _from_object(obj: dict) -> 'UnpywallRecord':
+        # nested objects are already frozen by json.loads, so only lists
+        # need to be converted; dict.update skips the read-only methods
+        for key, value in obj.items():
+            if type(value) is list:
+                obj[key] = UnpywallRecordList._from_list(value)
+        record = dict.__new__(UnpywallRecord)
+        dict.update(record, obj)
+        return record
+
+    @staticmethod
+    def thaw(value):
+        """
+        Return a modifiable copy of a JSON value.
+
+        Parameters
+        ----------
+        value : JSON object
+            A dict, list or scalar JSON value.
+
+        Returns
+        -------
+        JSON object
+            The value with all dicts and lists replaced by plain copies.
+        """
+        if isinstance(value, dict):
+            return {key: UnpywallRecord.thaw(item)
+                    for key, item in value.items()}
+        if isinstance(value, list):
+            return [UnpywallRecord.thaw(item) for item in value]
+        return value
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('UnpywallRecord is read-only. Use copy.deepcopy'
+                        ' to get a modifiable copy')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self) -> dict:
+        return UnpywallRecord.thaw(self)
+
+    def __deepcopy__(self, memo) -> dict:
+        return UnpywallRecord.thaw(self)
+
+    def __reduce__(self):
+        return (UnpywallRecord, (UnpywallRecord.thaw(self),))
+
+
+class UnpywallRecordList(list):
+    """
+    This class provides a read-only list inside an UnpywallRecord.
+    """
+
+    def __init__(self, data=()) -> None:
+        super().__init__(UnpywallRecord.freeze(item) for item in data)
+
+    @staticmethod
+    def _from_list(items: list) -> 'UnpywallRecordList':
+        frozen = list.__new__(UnpywallRecordList)
+        list.extend(frozen, [UnpywallRecordList._from_list(item)
+                             if type(item) is list else item
+                             for item in items])
+        return frozen
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('UnpywallRecordList is read-only. Use copy.deepcopy'
+                        ' to get a modifiable copy')
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = _read_only
+    reverse = sort = _read_only
+
+    def __copy__(self) -> list:
+        return UnpywallRecord.thaw(self)
+
+    def __deepcopy__(self, memo) -> list:
+        return UnpywallRecord.thaw(self)
+
+    def __reduce__(self):
+        return (UnpywallRecordList, (UnpywallRecord.thaw(self),))
+
+
+class UnpywallSQLiteDict(MutableMapping):
+    """
+    This class provides a dictionary that keeps its items in a table of an
+    SQLite database. Every change is written to disk in its own transaction,
+    so inserting or reading a single item does not depend on the size of
+    the table.
+
+    Attributes
+    ----------
+    table : str
+        The name of the table that stores the items.
+    """
+
+    def __init__(self,
+                 connection: sqlite3.Connection,
+                 table: str,
+                 lock=None) -> None:
+        """
+        Create a table-backed dictionary.
+
+        Parameters
+        ----------
+        connection : sqlite3.Connection
+            The connection to the database.
+        table : str
+            The name of the table that stores the items.
+        lock : threading.RLock
+            A lock that guards the connection if it is shared between threads.
+        """
+        self._connection = connection
+        self.table = table
+        self._lock = lock if lock else threading.RLock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS {0} (key TEXT PRIMARY KEY,'
+                ' value BLOB)'.format(table))
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> list:
+        with self._lock, self._connection:
+            cursor = self._connection.execute(sql.format(self.table),
+                                              parameters)
+            return cursor.fetchall()
+
+    def _execute_many(self, sql: str, parameters: list) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(sql.format(self.table), parameters)
+
+    def __getitem__(self, key: str):
+        rows = self._execute('SELECT value FROM {0} WHERE key = ?', (key,))
+        if not rows:
+            raise KeyError(key)
+        return pickle.loads(rows[0][0])
+
+    def __setitem__(self, key: str, value) -> None:
+        self._execute('INSERT OR REPLACE INTO {0} (key, value) VALUES (?, ?)',
+                      (key, pickle.dumps(value)))
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            if key not in self:
+                raise KeyError(key)
+            self._execute('DELETE FROM {0} WHERE key = ?', (key,))
+
+    def __contains__(self, key) -> bool:
+        return bool(self._execute('SELECT 1 FROM {0} WHERE key = ?', (key,)))
+
+    def __iter__(self):
+        return iter([row[0] for row in self._execute('SELECT key FROM {0}')])
+
+    def __len__(self) -> int:
+        return self._execute('SELECT COUNT(*) FROM {0}')[0][0]
+
+    def __repr__(self) -> str:
+        return 'UnpywallSQLiteDict(table={0}, items={1})'.format(
+            self.table, len(self))
+
+    def clear(self) -> None:
+        self._execute('DELETE FROM {0}')
+
+    def items(self) -> list:
+        return [(key, pickle.loads(value)) for key, value in
+                self._execute('SELECT key, value FROM {0}')]
+
+    def sizes(self) -> dict:
+        """
+        Return the number of bytes that each item takes in the database.
+        """
+        return dict(self._execute('SELECT key, length(value) FROM {0}'))
+
+    def delete_many(self, keys: list) -> None:
+        # delete all items in one transaction
+        self._execute_many('DELETE FROM {0} WHERE key = ?',
+                           [(key,) for key in keys])
+
+    def update(self, items=(), **kwargs) -> None:
+        # insert all items in one transaction
+        items = dict(items, **kwargs)
+        self._execute_many('INSERT OR REPLACE INTO {0} (key, value)'
+                           ' VALUES (?, ?)',
+                           [(key, pickle.dumps(value))
+                            for key, value in items.items()])
+
+
+class UnpywallCache(UnpywallBackend):
     """
     This class stores query results from Unpaywall.
     It has a configurable timeout that can also be set to never expire.
@@ -15,14 +270,65 @@ class UnpywallCache:
     ----------
     name : string
         The filename used to save and load the cache by default.
+    storage : str
+        Either 'pickle' or 'sqlite'. A 'pickle' cache is held in memory and
+        rewritten as a whole on every change. A 'sqlite' cache writes each
+        entry to an SQLite database as it is added and reads entries on
+        demand, so opening it does not depend on the size of the cache.
     content : dict
-        A dictionary mapping dois to requests.Response objects.
+        A dictionary mapping dois to the raw JSON records returned by
+        Unpaywall.
     access_times : dict
         A dictionary mapping dois to the datetime when each was last updated.
+    validators : dict
+        A dictionary mapping dois to the ETag and Last-Modified headers that
+        Unpaywall sent with each record. They are used to ask Unpaywall
+        whether a record has changed.
+    failures : dict
+        A dictionary mapping dois that Unpaywall could not find to the status
+        code of the response and the time of the request. Only the status
+        codes in failure_statuses are stored.
+    failure_timeout : float
+        The number of seconds that a failed request is remembered.
+    stale_while_revalidate : float
+        The number of seconds after an entry expires during which the
+        expired record is still returned while it is refreshed in the
+        background.
+    memory_size : int
+        The number of parsed records that are kept in memory. Lookups of
+        these records return the same read-only object without parsing or
+        copying it.
+    max_entries : int
+        The maximum number of entries in the cache, or None.
+    max_bytes : int
+        The maximum number of bytes of the stored records, or None.
+    eviction : str
+        Either 'lru' or 'lfu'. The policy used to remove entries once the
+        cache exceeds max_entries or max_bytes: the least recently used or
+        the least frequently used entries are removed first.
+    rate_limiter : UnpywallRateLimiter
+        The rate limiter that is shared by all requests to Unpaywall.
+    session : UnpywallSession
+        The HTTP session that is shared by all requests to Unpaywall.
 
     """
 
-    def __init__(self, name: str = None, timeout=None) -> None:
+    # the mappings from dois to the data of each entry
+    tables = ['content', 'access_times', 'validators', 'failures']
+
+    # the status codes that depend on the DOI and are remembered as failures
+    failure_statuses = (400, 404, 410)
+
+    def __init__(self, name: str = None, timeout=None,
+                 rate_limiter=None, session=None, storage=None,
+                 memory_size: int = 1000,
+                 mmap_size: int = 256 * 1024 * 1024,
+                 busy_timeout: float = 30,
+                 max_entries: int = None,
+                 max_bytes: int = None,
+                 eviction: str = 'lru',
+                 stale_while_revalidate: float = 0,
+                 failure_timeout: float = 24 * 60 * 60) -> None:
         """
         Create a cache object.
 
@@ -32,25 +338,111 @@ class UnpywallCache:
             The number of seconds that each entry should last.
         name : str
             The filename used to save and load the cache by default.
+        storage : str
+            Either 'pickle' or 'sqlite'. If None, the format of an existing
+            cache file is detected and new caches use 'pickle'.
+        memory_size : int
+            The number of parsed records that are kept in memory.
+        mmap_size : int
+            The number of bytes of a 'sqlite' cache that are read through
+            memory-mapped I/O. 0 disables memory mapping.
+        busy_timeout : float
+            The number of seconds to wait for another process that is writing
+            to a 'sqlite' cache.
+        max_entries : int
+            The maximum number of entries. If None, the number of entries is
+            not limited.
+        max_bytes : int
+            The maximum number of bytes of the stored records. If None, the
+            size of the cache is not limited.
+        eviction : str
+            Either 'lru' or 'lfu'. Whether the least recently or the least
+            frequently used entries are removed once the cache is full.
+        stale_while_revalidate : float
+            The number of seconds after an entry expires during which get
+            returns the expired record right away and refreshes it in the
+            background. 0 disables stale records.
+        failure_timeout : float
+            The number of seconds that a DOI is not requested again after
+            Unpaywall answered with a client error such as 404 Not Found.
+            0 disables remembering failed requests.
+        rate_limiter : UnpywallRateLimiter
+            A custom rate limiter to be used instead of the standard rate
+            limiter.
+        session : UnpywallSession
+            A custom HTTP session to be used instead of the standard session.
         """
+        from .utils import UnpywallRateLimiter, UnpywallSession
+
         if not name:
             self.name = os.path.join(os.getcwd(), 'unpaywall_cache')
         else:
             self.name = name
+        if not storage:
+            storage = 'sqlite' if self._is_sqlite(self.name) else 'pickle'
+        if storage not in ['pickle', 'sqlite']:
+            raise ValueError('The argument storage only accepts the'
+                             ' values "pickle" and "sqlite"')
+        if eviction not in ['lru', 'lfu']:
+            raise ValueError('The argument eviction only accepts the'
+                             ' values "lru" and "lfu"')
+        self.storage = storage
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self.stale_while_revalidate = stale_while_revalidate
+        self.failure_timeout = failure_timeout
+        self._usage = None
+        self._heap = []
+        self._tick = itertools.count()
+        self._revalidating = set()
+        self._queue = None
+        self._bytes = 0
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self._records = OrderedDict()
+        self._deleted = set()
+        self._stat = None
+        self._connection = None
+        self._lock = threading.RLock()
+        self.reset_stats()
         try:
             self.load(self.name)
         except FileNotFoundError:
             # print('No cache found. A new cache was initialized.')
             self.reset_cache()
         self.timeout = timeout
+        if max_entries or max_bytes:
+            self._index()
+        if rate_limiter:
+            self.rate_limiter = rate_limiter
+        else:
+            self.rate_limiter = UnpywallRateLimiter()
+        if session:
+            self.session = session
+        else:
+            self.session = UnpywallSession()
 
     def reset_cache(self) -> None:
         """
         Set the cache to a blank state.
         """
-        self.content = {}
-        self.access_times = {}
-        self.save()
+        with self._lock:
+            self._records.clear()
+            if self._usage is not None:
+                self._usage.clear()
+                self._heap.clear()
+                self._bytes = 0
+            if self.storage == 'sqlite':
+                self._connect()
+                for table in UnpywallCache.tables:
+                    getattr(self, table).clear()
+            else:
+                for table in UnpywallCache.tables:
+                    setattr(self, table, {})
+                self._deleted.clear()
+                self._save_pickle(self.name, merge=False)
 
     def delete(self, doi: str) -> None:
         """
@@ -61,11 +453,9 @@ class UnpywallCache:
         doi : str
             The DOI to be removed from the cache.
         """
-        if doi in self.access_times:
-            del self.access_times[doi]
-        if doi in self.content:
-            del self.content[doi]
-        self.save()
+        with self._lock:
+            self._remove([doi])
+            self.save()
 
     def timed_out(self, doi: str) -> bool:
         """
@@ -105,29 +495,586 @@ class UnpywallCache:
 
         Returns
         -------
-        record : requests.Response
-            The response from Unpaywall.
+        record : UnpywallRecord
+            The JSON record from Unpaywall. The record is read-only and may
+            be shared with other callers. Use copy.deepcopy to get a
+            modifiable copy.
         """
         record = None
 
         if not ignore_cache:
-            if (doi not in self.content) or self.timed_out(doi) or force:
-                downloaded = self.download(doi, errors)
-                if downloaded:
-                    self.access_times[doi] = time.time()
-                    self.content[doi] = downloaded
-                    self.save()
-                    record = downloaded
-            else:
-                record = deepcopy(self.content[doi])
+            if not force:
+                stale = self.stale_while_revalidate > 0
+                record = self.lookup(doi, stale=stale)
+                if record is not None:
+                    if stale and self._expired(self.access_times.get(doi)):
+                        self._revalidate(doi)
+                    return record
+
+                failure = self.failed(doi)
+                if failure is not None:
+                    self._count('failures')
+                    return self._fail(doi, failure[0], errors)
+
+            record = self.refresh(doi, errors)
         else:
-            record = self.download(doi, errors)
+            downloaded = self.download(doi, errors)
+            if downloaded:
+                record = UnpywallRecord.loads(downloaded.content)
         return record
 
+    def failed(self, doi: str):
+        """
+        Return the status code and time of the last failed request for the
+        given doi, or None if it has not failed within failure_timeout.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI to be looked up.
+
+        Returns
+        -------
+        tuple or None
+            The status code and the time of the failed request.
+        """
+        if not self.failure_timeout:
+            return None
+        failure = self.failures.get(doi)
+        if failure is None or time.time() > failure[1] + self.failure_timeout:
+            return None
+        return failure
+
+    def _fail(self, doi: str, status: int, errors: str):
+        """
+        Raise or warn about a DOI that failed before without sending a new
+        request.
+        """
+        from .utils import UnpywallURL
+
+        if errors == 'raise':
+            r = requests.Response()
+            r.status_code = status
+            r.reason = 'Failed within failure_timeout'
+            r.url = UnpywallURL(doi=doi).doi_url
+            r.raise_for_status()
+
+        warnings.warn('Could not download doi: {}'.format(doi))
+        return None
+
+    def refresh(self, doi: str, errors: str = 'raise'):
+        """
+        Retrieve the record for the given doi from Unpaywall and store it.
+        If the cached entry has an ETag or a Last-Modified date, the request
+        is conditional: when the record has not changed, Unpaywall answers
+        without sending it again and the entry is only renewed.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI to be retrieved.
+        errors : str
+            Whether to ignore or raise errors.
+
+        Returns
+        -------
+        record : UnpywallRecord
+            The JSON record from Unpaywall or None if it could not be
+            retrieved.
+        """
+        headers = {}
+        validators = self.validators.get(doi)
+        if validators and doi in self.content:
+            if 'ETag' in validators:
+                headers['If-None-Match'] = validators['ETag']
+            if 'Last-Modified' in validators:
+                headers['If-Modified-Since'] = validators['Last-Modified']
+
+        if headers:
+            downloaded = self.download(doi, errors, headers=headers)
+        else:
+            downloaded = self.download(doi, errors)
+        if downloaded is None:
+            return None
+
+        if downloaded.status_code == 304:
+            record = self._renew(doi)
+            if record is not None:
+                return record
+            # the entry was removed in the meantime
+            downloaded = self.download(doi, errors)
+            if downloaded is None:
+                return None
+
+        validators = {key: downloaded.headers[key]
+                      for key in ['ETag', 'Last-Modified']
+                      if key in downloaded.headers}
+        return self.put(doi, downloaded.content, validators)
+
+    def _renew(self, doi: str):
+        """
+        Restart the timeout of an unchanged entry and return its record, or
+        None if the entry is not cached anymore.
+        """
+        with self._lock:
+            record = self._records.get(doi)
+            if record is None:
+                entry = self._entry(doi)
+                if entry is None:
+                    return None
+                record = self._parse(entry[0])
+                self._remember(doi, record)
+            self.access_times[doi] = time.time()
+            self.save()
+        return record
+
+    def _revalidate(self, doi: str) -> None:
+        """
+        Refresh an expired entry in a background thread. Requests of the
+        background thread pass the rate limiter of the cache.
+        """
+        with self._lock:
+            if doi in self._revalidating:
+                return
+            self._revalidating.add(doi)
+            if self._queue is None:
+                self._queue = queue.Queue()
+                threading.Thread(target=self._revalidate_worker,
+                                 name='unpywall-revalidate',
+                                 daemon=True).start()
+        self._queue.put(doi)
+
+    def _revalidate_worker(self) -> None:
+        while True:
+            doi = self._queue.get()
+            # the stale record is kept and refreshed on a later request
+            try:
+                self.refresh(doi)
+            except requests.exceptions.RequestException:
+                pass
+            # any other error must not end the thread, otherwise no entry
+            # would be refreshed again
+            except Exception as e:
+                warnings.warn('Could not revalidate doi: {0} ({1})'.format(
+                    doi, e))
+            finally:
+                with self._lock:
+                    self._revalidating.discard(doi)
+                self._queue.task_done()
+
+    def put(self, doi: str, content: bytes, validators: dict = None):
+        """
+        Store a record that was retrieved from Unpaywall.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI of the record.
+        content : bytes
+            The raw JSON record as returned by Unpaywall.
+        validators : dict
+            The ETag and Last-Modified headers of the response, if any.
+
+        Returns
+        -------
+        record : UnpywallRecord
+            The parsed record.
+        """
+        record = UnpywallRecord.loads(content)
+        with self._lock:
+            self.access_times[doi] = time.time()
+            self.content[doi] = content
+            if validators:
+                self.validators[doi] = validators
+            elif doi in self.validators:
+                del self.validators[doi]
+            if doi in self.failures:
+                del self.failures[doi]
+            self._deleted.discard(doi)
+            if self._usage is not None:
+                self._track(doi, self._size(content))
+                self._evict(keep=doi)
+            self.save()
+            self._remember(doi, record)
+        return record
+
+    def lookup(self, doi: str, stale: bool = False):
+        """
+        Return the cached record for the given doi without contacting
+        Unpaywall.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI to be looked up.
+        stale : bool
+            Whether to return records that expired less than
+            stale_while_revalidate seconds ago.
+
+        Returns
+        -------
+        record : UnpywallRecord or None
+            The JSON record or None if the DOI is not cached or its entry has
+            expired.
+        """
+        with self._lock:
+            record = self._records.get(doi)
+            if record is not None:
+                self._records.move_to_end(doi)
+                self._use(doi)
+
+        if record is not None:
+            if self.timeout and self._expired(self.access_times.get(doi),
+                                              stale):
+                self._count('memory_misses', 'expired')
+                return None
+            self._count('memory_hits')
+            return record
+
+        entry = self._entry(doi)
+        if entry is None:
+            self._count('memory_misses', 'store_misses')
+            return None
+
+        content, access_time = entry
+        if self._expired(access_time, stale):
+            self._count('memory_misses', 'store_misses', 'expired')
+            return None
+
+        record = self._parse(content)
+        with self._lock:
+            self._remember(doi, record)
+            self._use(doi)
+            self._count('memory_misses', 'store_hits')
+
+        return record
+
+    def _expired(self, access_time: float, stale: bool = False) -> bool:
+        """
+        Return whether an entry stored at the given time has expired. With
+        stale, entries are kept for another stale_while_revalidate seconds.
+        """
+        if not self.timeout:
+            return False
+        if access_time is None:
+            return True
+        timeout = self.timeout
+        if stale:
+            timeout += self.stale_while_revalidate
+        return time.time() > access_time + timeout
+
+    def stats(self) -> dict:
+        """
+        Return how often lookups were served by each tier of the cache since
+        it was created or the statistics were reset.
+
+        The cache has two tiers: the memory_size most recently used records
+        are kept parsed in memory, and all records are kept in the storage.
+        A lookup that misses the memory tier reads the storage.
+
+        Returns
+        -------
+        dict
+            The number of memory_hits, memory_misses, store_hits,
+            store_misses, expired entries and failures, that is, lookups of
+            DOIs whose last request failed, and the number of records in
+            memory and in the storage.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_records'] = len(self._records)
+            stats['store_records'] = len(self.content)
+        return stats
+
+    def reset_stats(self) -> None:
+        """
+        Set all hit and miss counts to zero.
+        """
+        with self._lock:
+            self._stats = dict.fromkeys(['memory_hits', 'memory_misses',
+                                         'store_hits', 'store_misses',
+                                         'expired', 'failures'], 0)
+
+    def _count(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._stats[key] += 1
+
+    def _entry(self, doi: str):
+        """
+        Return the stored record and access time of the given doi, or None if
+        it is not cached. A 'sqlite' cache reads both in a single query.
+        """
+        if self.storage == 'sqlite':
+            with self._lock:
+                row = self._connection.execute(
+                    'SELECT content.value, access_times.value FROM content'
+                    ' LEFT JOIN access_times ON access_times.key ='
+                    ' content.key WHERE content.key = ?', (doi,)).fetchone()
+            if row is None:
+                return None
+            return (pickle.loads(row[0]),
+                    pickle.loads(row[1]) if row[1] is not None else None)
+
+        try:
+            return self.content[doi], self.access_times.get(doi)
+        except KeyError:
+            return None
+
+    def compact(self) -> int:
+        """
+        Remove expired entries and failed requests, then remove entries
+        according to the eviction policy until the cache is within
+        max_entries and max_bytes. Entries that other processes added to a
+        shared cache are counted as well.
+
+        Returns
+        -------
+        int
+            The number of removed entries.
+        """
+        with self._lock:
+            expired = []
+            if self.timeout:
+                now = time.time()
+                expired = [doi for doi, access_time
+                           in self.access_times.items()
+                           if now > access_time + self.timeout]
+            self._remove(expired)
+
+            if self.failure_timeout:
+                now = time.time()
+                for doi in [doi for doi, failure in self.failures.items()
+                            if now > failure[1] + self.failure_timeout]:
+                    del self.failures[doi]
+
+            removed = len(expired)
+            if self.max_entries or self.max_bytes:
+                self._index()
+                removed += self._evict()
+            self.save()
+        return removed
+
+    def _index(self) -> None:
+        """
+        Read the size of each entry and order the entries by the time they
+        were stored, which is used as the initial order of use.
+        """
+        with self._lock:
+            if self.storage == 'sqlite':
+                sizes = self.content.sizes()
+            else:
+                sizes = {doi: len(value)
+                         for doi, value in self.content.items()}
+            access_times = dict(self.access_times.items())
+            hits = self._usage or {}
+
+            self._usage = OrderedDict(
+                (doi, [hits[doi][0] if doi in hits else 0,
+                       sizes[doi],
+                       next(self._tick)])
+                for doi in sorted(sizes,
+                                  key=lambda doi: access_times.get(doi, 0)))
+            self._bytes = sum(sizes.values())
+            self._heapify()
+
+    def _size(self, content: bytes) -> int:
+        """
+        Return the number of bytes a record takes in the storage.
+        """
+        if self.storage == 'sqlite':
+            return len(pickle.dumps(content))
+        return len(content)
+
+    def _track(self, doi: str, size: int) -> None:
+        """
+        Count a new or replaced entry as the most recently used one.
+        """
+        usage = self._usage.pop(doi, None)
+        if usage is not None:
+            self._bytes -= usage[1]
+        self._usage[doi] = [usage[0] + 1 if usage else 1,
+                            size,
+                            next(self._tick)]
+        self._bytes += size
+        self._push(doi)
+
+    def _use(self, doi: str) -> None:
+        """
+        Count a lookup of an entry.
+        """
+        if self._usage is not None and doi in self._usage:
+            usage = self._usage[doi]
+            usage[0] += 1
+            usage[2] = next(self._tick)
+            self._usage.move_to_end(doi)
+            self._push(doi)
+
+    def _push(self, doi: str) -> None:
+        """
+        Add the count and the time of the last use of an entry to the heap of
+        the LFU policy. Earlier items of the entry are outdated and skipped.
+        """
+        if self.eviction != 'lfu':
+            return
+        usage = self._usage[doi]
+        heapq.heappush(self._heap, (usage[0], usage[2], doi))
+        # drop outdated items once they make up half of the heap
+        if len(self._heap) > 2 * len(self._usage):
+            self._heapify()
+
+    def _heapify(self) -> None:
+        """
+        Rebuild the heap of the LFU policy from the current entries.
+        """
+        self._heap = []
+        if self.eviction == 'lfu':
+            self._heap = [(usage[0], usage[2], doi)
+                          for doi, usage in self._usage.items()]
+            heapq.heapify(self._heap)
+
+    def _evict(self, keep: str = None) -> int:
+        """
+        Remove entries according to the eviction policy until the cache is
+        within max_entries and max_bytes.
+
+        Parameters
+        ----------
+        keep : str
+            A DOI that is not removed, usually the entry that was just added.
+
+        Returns
+        -------
+        int
+            The number of removed entries.
+        """
+        def full(removed, size):
+            return ((self.max_entries and
+                     len(self._usage) - removed > self.max_entries) or
+                    (self.max_bytes and self._bytes - size > self.max_bytes))
+
+        if not full(0, 0):
+            return 0
+
+        victims = []
+        size = 0
+        if self.eviction == 'lfu':
+            # the heap is ordered by count and then by the time of the last
+            # use, so the least recently used of the least frequently used
+            # entries is removed first
+            kept = []
+            while self._heap and full(len(victims), size):
+                item = heapq.heappop(self._heap)
+                usage = self._usage.get(item[2])
+                if usage is None or usage[2] != item[1]:
+                    continue
+                if item[2] == keep:
+                    kept.append(item)
+                    continue
+                victims.append(item[2])
+                size += usage[1]
+            for item in kept:
+                heapq.heappush(self._heap, item)
+        else:
+            # entries are ordered from the least to the most recently used
+            for doi in self._usage:
+                if not full(len(victims), size):
+                    break
+                if doi != keep:
+                    victims.append(doi)
+                    size += self._usage[doi][1]
+
+        self._remove(victims)
+        return len(victims)
+
+    def _remove(self, dois: list) -> None:
+        """
+        Remove entries without saving the cache.
+        """
+        if not dois:
+            return
+        with self._lock:
+            for doi in dois:
+                self._records.pop(doi, None)
+                if self._usage is not None:
+                    usage = self._usage.pop(doi, None)
+                    if usage is not None:
+                        self._bytes -= usage[1]
+            if self.storage == 'sqlite':
+                for table in UnpywallCache.tables:
+                    getattr(self, table).delete_many(dois)
+                return
+            for doi in dois:
+                for table in UnpywallCache.tables:
+                    getattr(self, table).pop(doi, None)
+                self._deleted.add(doi)
+
+    def _remember(self, doi: str, record: UnpywallRecord) -> None:
+        """
+        Keep a parsed record in memory and drop the least recently used
+        records beyond memory_size.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI of the record.
+        record : UnpywallRecord
+            The parsed record.
+        """
+        if self.memory_size < 1:
+            return
+        self._records[doi] = record
+        self._records.move_to_end(doi)
+        while len(self._records) > self.memory_size:
+            self._records.popitem(last=False)
+
+    @staticmethod
+    def _compact(value) -> bytes:
+        """
+        Convert an entry of a cache created by an earlier version, which
+        stored whole requests.Response objects, into raw JSON.
+
+        Parameters
+        ----------
+        value : bytes or requests.Response
+            A cache entry.
+
+        Returns
+        -------
+        bytes
+            The raw JSON record.
+        """
+        if isinstance(value, requests.Response):
+            return value.content
+        return value
+
+    @staticmethod
+    def _parse(value) -> UnpywallRecord:
+        """
+        Parse a cache entry into a JSON record.
+
+        Parameters
+        ----------
+        value : bytes or requests.Response
+            A cache entry.
+
+        Returns
+        -------
+        UnpywallRecord
+            The JSON record.
+        """
+        return UnpywallRecord.loads(UnpywallCache._compact(value))
+
     def save(self, name=None) -> None:
         """
         Save the current cache contents to a file.
 
+        A 'pickle' cache is written to a temporary file that replaces the
+        cache file, so readers never see a partially written cache. While the
+        cache file is locked, entries that other processes saved to it since
+        it was last read are merged in, so processes sharing the file do not
+        overwrite each other's entries.
+
         Parameters
         ----------
         name : str or None
@@ -136,10 +1083,133 @@ class UnpywallCache:
         """
         if not name:
             name = self.name
-        with open(name, 'wb') as handle:
-            pickle.dump({'content': self.content,
-                         'access_times': self.access_times},
-                        handle)
+        if self.storage == 'sqlite':
+            # entries are already on disk, only copies need to be written
+            if os.path.abspath(name) != os.path.abspath(self.name):
+                with self._lock:
+                    target = sqlite3.connect(name)
+                    self._connection.backup(target)
+                    target.close()
+            return
+        self._save_pickle(name, merge=(os.path.abspath(name) ==
+                                       os.path.abspath(self.name)))
+
+    def _save_pickle(self, name: str, merge: bool) -> None:
+        """
+        Write the entries of a pickle cache to a file.
+
+        Parameters
+        ----------
+        name : str
+            The filename of the pickle cache.
+        merge : bool
+            Whether to merge entries that other processes saved to the file.
+        """
+        with self._lock, self._file_lock(name):
+            if merge:
+                self._merge(name)
+
+            temp = '{0}.tmp'.format(name)
+            with open(temp, 'wb') as handle:
+                pickle.dump({table: getattr(self, table)
+                             for table in UnpywallCache.tables},
+                            handle)
+            os.replace(temp, name)
+
+            self._deleted.clear()
+            if os.path.abspath(name) == os.path.abspath(self.name):
+                self._stat = self._file_stat(name)
+
+    def _merge(self, name: str) -> None:
+        """
+        Add entries that other processes saved to the cache file since it was
+        last read or written by this cache. Of two entries for the same DOI,
+        the one stored last is kept.
+        """
+        stat = self._file_stat(name)
+        if stat is None or stat == self._stat:
+            return
+
+        data = self._load_pickle(name)
+        access_times = data['access_times']
+        validators = data['validators']
+        for doi, value in data['content'].items():
+            if doi in self._deleted:
+                continue
+            if (doi not in self.content
+                    or access_times.get(doi, 0) >
+                    self.access_times.get(doi, 0)):
+                self.content[doi] = value
+                self.access_times[doi] = access_times.get(doi, 0)
+                self._records.pop(doi, None)
+                self.validators.pop(doi, None)
+                if doi in validators:
+                    self.validators[doi] = validators[doi]
+                if self._usage is not None:
+                    self._track(doi, self._size(value))
+
+        for doi, failure in data['failures'].items():
+            if (doi not in self._deleted and
+                    failure[1] > self.failures.get(doi, (None, 0))[1]):
+                self.failures[doi] = failure
+
+    @staticmethod
+    def _file_stat(name: str):
+        """
+        Return the inode, size and modification time of a file, or None if
+        it does not exist.
+        """
+        try:
+            stat = os.stat(name)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    @contextmanager
+    def _file_lock(name: str):
+        """
+        Hold an exclusive lock on the file name.lock, which serializes writes
+        of processes sharing a pickle cache. The lock file is removed when
+        the lock is released.
+        """
+        path = '{0}.lock'.format(name)
+        while True:
+            handle = open(path, 'a+b')
+            if not fcntl:  # pragma: no cover
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            # the holder of the lock may have removed the file in the
+            # meantime, then the lock has to be taken on a new file
+            try:
+                if os.path.samestat(os.fstat(handle.fileno()),
+                                    os.stat(path)):
+                    break
+            except FileNotFoundError:
+                pass
+            handle.close()
+
+        try:
+            yield
+        finally:
+            if fcntl:
+                # removed before it is unlocked, so processes that wait for
+                # the lock notice the removal
+                os.remove(path)
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                handle.close()
+            else:  # pragma: no cover
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+                handle.close()
+                # the file cannot be removed while another process has it
+                # open, that process removes it later
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
 
     def load(self, name=None) -> None:
         """
@@ -153,14 +1223,115 @@ class UnpywallCache:
         """
         if not name:
             name = self.name
+        with self._lock:
+            self._records.clear()
+            if self.storage == 'sqlite':
+                self._connect()
+                if os.path.abspath(name) == os.path.abspath(self.name):
+                    pass
+                elif self._is_sqlite(name):
+                    source = sqlite3.connect(name)
+                    source.backup(self._connection)
+                    source.close()
+                    # create tables that caches of earlier versions lack
+                    self._connection.close()
+                    self._connection = None
+                    self._connect()
+                else:
+                    # import a pickle cache
+                    data = self._load_pickle(name)
+                    for table in UnpywallCache.tables:
+                        getattr(self, table).update(data[table])
+            else:
+                self._deleted.clear()
+                data = self._load_pickle(name)
+                for table in UnpywallCache.tables:
+                    setattr(self, table, data[table])
+                # the loaded entries replace those in the cache file
+                self._stat = self._file_stat(self.name)
+            if self._usage is not None:
+                self._index()
+
+    @staticmethod
+    def _load_pickle(name: str) -> dict:
+        """
+        Read the entries of a pickle cache. Entries of caches created by
+        earlier versions are converted to raw JSON.
+
+        Parameters
+        ----------
+        name : str
+            The filename of the pickle cache.
+
+        Returns
+        -------
+        dict
+            A dictionary for each of UnpywallCache.tables. Tables that caches
+            of earlier versions lack are empty.
+        """
         with open(name, 'rb') as handle:
             data = pickle.load(handle)
-        self.content = data['content']
-        self.access_times = data['access_times']
+        data = {table: data.get(table, {}) for table in UnpywallCache.tables}
+        data['content'] = {doi: UnpywallCache._compact(value)
+                           for doi, value in data['content'].items()}
+        return data
+
+    def _connect(self) -> None:
+        """
+        Open the SQLite database of the cache if it is not open yet.
+        """
+        if self._connection:
+            return
+        self._connection = sqlite3.connect(self.name,
+                                           timeout=self.busy_timeout,
+                                           check_same_thread=False)
+        # read pages through the page cache of the operating system instead
+        # of copying them into the memory of the process
+        self._connection.execute('PRAGMA mmap_size = {0:d}'.format(
+            self.mmap_size))
+        # with a write-ahead log, processes sharing the cache read while
+        # another process writes, and writers wait for each other
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        for table in UnpywallCache.tables:
+            setattr(self, table, UnpywallSQLiteDict(self._connection,
+                                                    table,
+                                                    self._lock))
+
+    @staticmethod
+    def _is_sqlite(name: str) -> bool:
+        """
+        Return whether the given file is an SQLite database.
+
+        Parameters
+        ----------
+        name : str
+            The filename of the cache.
+        """
+        try:
+            with open(name, 'rb') as handle:
+                return handle.read(16) == b'SQLite format 3\x00'
+        except (FileNotFoundError, IsADirectoryError):
+            return False
+
+    def _remember_failure(self, doi: str, status: int) -> None:
+        """
+        Store a failed request if Unpaywall answered that the DOI is invalid
+        (400), unknown (404) or gone (410). Other errors, for example
+        rejected emails (401, 403, 422), rate limiting (429) and server
+        errors, are not stored, because they do not depend on the DOI.
+        """
+        if (not self.failure_timeout or
+                status not in UnpywallCache.failure_statuses):
+            return
+        with self._lock:
+            self.failures[doi] = (status, time.time())
+            self.save()
 
-    def download(self, doi: str, errors: str):
+    def download(self, doi: str, errors: str, headers: dict = None):
         """
-        Retrieve a record from Unpaywall.
+        Retrieve a record from Unpaywall. Connection errors, timeouts, rate
+        limiting and server errors are retried by the session of the cache.
 
         Parameters
         ----------
@@ -168,21 +1339,24 @@ class UnpywallCache:
             The DOI to be retrieved.
         errors : str
             Whether to ignore or raise errors.
+        headers : dict
+            Additional HTTP headers, for example of a conditional request.
         """
         from .utils import UnpywallURL
 
-        mandatory_wait_time = int(os.environ.get('MANDATORY_WAIT_TIME', 1))
-        time.sleep(mandatory_wait_time)
+        self.rate_limiter.acquire()
         url = UnpywallURL(doi=doi).doi_url
 
         try:
 
-            r = requests.get(url)
+            r = self.session.get(url, headers=headers)
             r.raise_for_status()
             return r
 
         # if DOI is invalid
         except requests.exceptions.HTTPError as HTTPError:
+            if HTTPError.response is not None:
+                self._remember_failure(doi, HTTPError.response.status_code)
             if errors == 'raise':
                 raise HTTPError
 
@@ -0,0 +1,253 @@
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import warnings
+import zlib
+
+from .backends import UnpywallBackend
+from .cache import UnpywallRecord
+
+
+class UnpywallSnapshot(UnpywallBackend):
+    """
+    This class looks up records in a local copy of the Unpaywall data dump
+    (https://unpaywall.org/products/snapshot). The dump is a JSON Lines file
+    with one record per line, optionally compressed with gzip.
+
+    An index that maps each DOI to its record is built once and stored next
+    to the dump. Afterwards, every lookup is a single index probe and does
+    not depend on the size of the dump. For an uncompressed dump, the index
+    stores the byte offset of each record. A gzip file cannot be read from
+    an arbitrary offset, so for a compressed dump the index stores the
+    records again in blocks of about 64 KiB that are compressed one by one,
+    and the block and offset of each record. In addition to the DOIs, the
+    index of a compressed dump therefore takes about as much disk space as
+    the dump itself.
+
+    Attributes
+    ----------
+    path : str
+        The path of the data dump.
+    index : str
+        The path of the index.
+    compressed : bool
+        Whether the data dump is compressed with gzip.
+    """
+
+    # batch size for inserts while building the index
+    _batch_size = 10000
+
+    # uncompressed size of the blocks of a compressed dump
+    _block_size = 64 * 1024
+
+    _doi_regex = re.compile(rb'"doi"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+    def __init__(self,
+                 path: str,
+                 index: str = None,
+                 progress: bool = False) -> None:
+        """
+        Open a data dump and build its index if it does not exist yet.
+
+        Parameters
+        ----------
+        path : str
+            The path of the data dump.
+        index : str
+            The path of the index. By default, '.index' is appended to the
+            path of the data dump.
+        progress : bool
+            Whether the progress of building the index should be printed out
+            or not.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError('No snapshot found at {0}'.format(path))
+
+        self.path = path
+        self.index = index if index else path + '.index'
+        self.compressed = UnpywallSnapshot._is_gzip(path)
+        self._lock = threading.Lock()
+        self._connection = None
+        self._handle = None
+
+        if not os.path.exists(self.index):
+            self.build_index(progress=progress)
+
+        self._connection = sqlite3.connect(self.index,
+                                           check_same_thread=False)
+        if not self.compressed:
+            self._handle = open(self.path, 'rb')
+
+    def __repr__(self) -> str:
+        return 'UnpywallSnapshot(path={0}, index={1})'.format(self.path,
+                                                              self.index)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def __contains__(self, doi: str) -> bool:
+        with self._lock:
+            return self._connection.execute(
+                'SELECT 1 FROM records WHERE doi = ?',
+                (doi.lower(),)).fetchone() is not None
+
+    @staticmethod
+    def _is_gzip(path: str) -> bool:
+        with open(path, 'rb') as handle:
+            return handle.read(2) == b'\x1f\x8b'
+
+    @staticmethod
+    def _get_doi(line: bytes) -> str:
+        """
+        Return the DOI of a line of the data dump without parsing the whole
+        record.
+        """
+        match = UnpywallSnapshot._doi_regex.search(line)
+        if match:
+            return json.loads(b'"' + match.group(1) + b'"').lower()
+        return json.loads(line)['doi'].lower()
+
+    def build_index(self, progress: bool = False) -> None:
+        """
+        Read the data dump once and write the index. The index is written
+        to a temporary file first, so an interrupted build does not leave a
+        broken index behind.
+
+        Parameters
+        ----------
+        progress : bool
+            Whether the progress of building the index should be printed out
+            or not.
+        """
+        from . import Unpywall
+
+        tmp = self.index + '.tmp'
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+        connection = sqlite3.connect(tmp)
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute('CREATE TABLE records (doi TEXT PRIMARY KEY,'
+                           ' block INTEGER, offset INTEGER, length INTEGER)')
+        connection.execute('CREATE TABLE blocks (block INTEGER PRIMARY KEY,'
+                           ' data BLOB)')
+
+        size = os.path.getsize(self.path)
+
+        with open(self.path, 'rb') as raw:
+            if self.compressed:
+                handle = gzip.GzipFile(fileobj=raw)
+            else:
+                handle = raw
+
+            batch = []
+            offset = 0
+            block = []
+            blocks = 0
+            for line in handle:
+                if line.strip():
+                    doi = UnpywallSnapshot._get_doi(line)
+                    if self.compressed:
+                        # the offset is relative to the start of the block
+                        batch.append((doi, blocks, offset, len(line)))
+                    else:
+                        batch.append((doi, None, offset, len(line)))
+                if self.compressed:
+                    # blank lines are kept, so the offsets stay valid
+                    block.append(line)
+                offset += len(line)
+
+                if self.compressed and offset >= UnpywallSnapshot._block_size:
+                    UnpywallSnapshot._insert_block(connection, blocks, block)
+                    blocks += 1
+                    block = []
+                    offset = 0
+
+                if len(batch) == UnpywallSnapshot._batch_size:
+                    UnpywallSnapshot._insert(connection, batch)
+                    batch = []
+                    if progress:
+                        Unpywall._progress(raw.tell() / size)
+
+            UnpywallSnapshot._insert(connection, batch)
+            if block:
+                UnpywallSnapshot._insert_block(connection, blocks, block)
+
+        connection.close()
+        os.replace(tmp, self.index)
+
+        if progress:
+            Unpywall._progress(1)
+
+    @staticmethod
+    def _insert(connection: sqlite3.Connection, batch: list) -> None:
+        with connection:
+            # the dump may contain a DOI more than once, the last one wins
+            connection.executemany('INSERT OR REPLACE INTO records'
+                                   ' VALUES (?, ?, ?, ?)', batch)
+
+    @staticmethod
+    def _insert_block(connection: sqlite3.Connection,
+                      block: int,
+                      lines: list) -> None:
+        with connection:
+            connection.execute('INSERT INTO blocks VALUES (?, ?)',
+                               (block, zlib.compress(b''.join(lines))))
+
+    def get(self, doi: str, errors: str = 'raise', **kwargs):
+        """
+        Return the record for the given doi.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI to be retrieved.
+        errors : str
+            Whether to ignore or raise errors.
+        **kwargs
+            Ignored. Accepted for compatibility with UnpywallCache.get.
+
+        Returns
+        -------
+        record : UnpywallRecord
+            The JSON record from the data dump.
+
+        Raises
+        ------
+        KeyError
+            If the DOI is not part of the data dump and errors is 'raise'.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT offset, length, data FROM records'
+                ' LEFT JOIN blocks USING (block) WHERE doi = ?',
+                (doi.lower(),)).fetchone()
+            if row and not self.compressed:
+                self._handle.seek(row[0])
+                data = self._handle.read(row[1])
+
+        if row is None:
+            if errors == 'raise':
+                raise KeyError('DOI not found in snapshot: {0}'.format(doi))
+            warnings.warn('Could not find doi: {}'.format(doi))
+            return None
+
+        if self.compressed:
+            data = zlib.decompress(row[2])[row[0]:row[0] + row[1]]
+
+        return UnpywallRecord.loads(data)
+
+    def close(self) -> None:
+        """
+        Close the index and the data dump.
+        """
+        if self._connection:
+            self._connection.close()
+        if self._handle:
+            self._handle.close()
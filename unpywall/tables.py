@@ -0,0 +1,114 @@
+import pandas as pd
+
+
+class UnpywallTables:
+    """
+    This class holds records from Unpaywall as three tables that are linked
+    by the DOI. Unlike the extended format, OA locations and authors are not
+    combined with each other, so the number of rows grows linearly with the
+    data. Tables are only joined when join is called.
+
+    Attributes
+    ----------
+    records : DataFrame
+        One row per DOI with the fields of the DOI object.
+    oa_locations : DataFrame
+        One row per OA location with the DOI in the first column.
+    authors : DataFrame
+        One row per author in z_authors with the DOI in the first column.
+    """
+
+    tables = ['oa_locations', 'authors']
+
+    def __init__(self,
+                 records: pd.DataFrame,
+                 oa_locations: pd.DataFrame,
+                 authors: pd.DataFrame) -> None:
+        self.records = records
+        self.oa_locations = oa_locations
+        self.authors = authors
+
+    def __repr__(self) -> str:
+        return ('UnpywallTables(records={0}, oa_locations={1},'
+                ' authors={2})').format(len(self.records),
+                                        len(self.oa_locations),
+                                        len(self.authors))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def empty(self) -> bool:
+        return self.records.empty
+
+    @classmethod
+    def from_records(cls, data: list) -> 'UnpywallTables':
+        """
+        Split records from Unpaywall into the three tables.
+
+        Parameters
+        ----------
+        data : list
+            A list of JSON records.
+
+        Returns
+        -------
+        UnpywallTables
+            The records, OA locations and authors.
+        """
+        from . import Unpywall
+
+        records = []
+        oa_locations = []
+        authors = []
+
+        for obj in data:
+            record = Unpywall._flatten(obj, max_level=1)
+            record.pop('oa_locations', None)
+            record.pop('z_authors', None)
+            records.append(record)
+
+            for rows, key in [(oa_locations, 'oa_locations'),
+                              (authors, 'z_authors')]:
+                for row in Unpywall._get_list(obj, key):
+                    row = Unpywall._flatten(row)
+                    row.pop('doi', None)
+                    rows.append(dict(doi=obj['doi'], **row))
+
+        return cls(records=pd.DataFrame(records),
+                   oa_locations=pd.DataFrame(oa_locations, columns=(
+                       None if oa_locations else ['doi'])),
+                   authors=pd.DataFrame(authors, columns=(
+                       None if authors else ['doi'])))
+
+    def join(self, *tables: str) -> pd.DataFrame:
+        """
+        Join the records with the given tables on the DOI.
+
+        Parameters
+        ----------
+        *tables : str
+            The tables to join, 'oa_locations' and/or 'authors'. By default,
+            both tables are joined, which gives the extended format with one
+            row per combination of OA location and author of each DOI.
+
+        Returns
+        -------
+        DataFrame
+            The joined tables.
+
+        Raises
+        ------
+        ValueError
+            If a table is unknown.
+        """
+        for table in tables:
+            if table not in UnpywallTables.tables:
+                raise ValueError('The argument tables only accepts the'
+                                 ' values "oa_locations" and "authors"')
+
+        df = self.records
+        for table in tables or UnpywallTables.tables:
+            df = df.merge(getattr(self, table), how='left', on='doi')
+
+        return df
@@ -1,5 +1,11 @@
 import os
+import random
 import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 class UnpywallCredentials:
@@ -117,3 +123,245 @@ class UnpywallURL:
             raise ValueError('Missing query')
         return ('https://api.unpaywall.org/v2/search/?query={0}&is_oa={1}'
                 '&email={2}').format(self.query, self.is_oa, self.email)
+
+
+class UnpywallRateLimiter:
+    """
+    This class provides a thread-safe token bucket that limits the number of
+    requests sent per second.
+
+    Attributes
+    ----------
+    rate : float
+        The number of requests per second. By default, one request per
+        MANDATORY_WAIT_TIME seconds (environment variable, default 1) is
+        allowed. A wait time of 0 disables the limit.
+    burst : int
+        The number of requests that can be sent at once after the limiter
+        has been idle.
+    calls : int
+        The number of requests that passed the limiter.
+    last_wait : float
+        The number of seconds the last request had to wait.
+    max_wait : float
+        The longest wait of a single request in seconds.
+    total_wait : float
+        The number of seconds all requests had to wait in total.
+    """
+
+    def __init__(self, rate: float = None, burst: int = 1) -> None:
+
+        if rate is None:
+            wait_time = float(os.environ.get('MANDATORY_WAIT_TIME', 1))
+            rate = 1 / wait_time if wait_time > 0 else float('inf')
+
+        if rate <= 0:
+            raise ValueError('The argument rate must be a positive number')
+
+        if not isinstance(burst, int) or burst < 1:
+            raise ValueError('The argument burst must be a positive integer')
+
+        self.rate = rate
+        self.burst = burst
+        self.calls = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return 'UnpywallRateLimiter(rate={0}, burst={1})'.format(self.rate,
+                                                                 self.burst)
+
+    def reserve(self) -> float:
+        """
+        Take a token from the bucket without waiting.
+
+        Returns
+        -------
+        float
+            The number of seconds the caller has to wait before sending
+            the request.
+        """
+        with self._lock:
+            now = time.monotonic()
+
+            if self.rate == float('inf'):
+                wait = 0.0
+            else:
+                self._tokens = min(self.burst,
+                                   self._tokens
+                                   + (now - self._updated) * self.rate)
+                self._tokens -= 1
+                # a negative balance queues the request behind earlier ones
+                wait = max(0.0, -self._tokens / self.rate)
+
+            self._updated = now
+            self.calls += 1
+            self.last_wait = wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_wait += wait
+
+        return wait
+
+    def acquire(self) -> float:
+        """
+        Block until a request may be sent.
+
+        Returns
+        -------
+        float
+            The number of seconds the caller waited.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class UnpywallRetry(Retry):
+    """
+    This class retries failed requests with exponential backoff. The backoff
+    is jittered, so clients that failed at the same time do not retry at the
+    same time, and a Retry-After header sent with 429 or 503 responses is
+    honored up to max_retry_after seconds.
+
+    Attributes
+    ----------
+    jitter : float
+        The fraction of each backoff that is random. 0 waits exactly
+        backoff_factor * 2 ** (retries - 1) seconds, 1 waits a random time
+        between 0 and that value.
+    max_retry_after : float
+        The maximum number of seconds to wait for a Retry-After header.
+    """
+
+    def __init__(self,
+                 *args,
+                 jitter: float = 0.5,
+                 max_retry_after: float = 120,
+                 **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.jitter = jitter
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs) -> 'UnpywallRetry':
+        # urllib3 creates a new object for each retry
+        retry = super().new(**kwargs)
+        retry.jitter = self.jitter
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return backoff - random.uniform(0, backoff * self.jitter)
+
+    def parse_retry_after(self, retry_after: str) -> float:
+        return min(super().parse_retry_after(retry_after),
+                   self.max_retry_after)
+
+
+class UnpywallSession:
+    """
+    This class provides a persistent HTTP session with a connection pool, so
+    consecutive requests reuse open connections instead of paying a new
+    TCP and TLS handshake each time.
+
+    Attributes
+    ----------
+    pool_size : int
+        The number of connections kept open per host.
+    timeout : float or tuple
+        The default timeout in seconds for each request. A tuple sets the
+        connect and read timeouts separately.
+    retries : int
+        The number of times a failed connection, a timeout, rate limiting
+        (429) or a server error is retried.
+    retry : UnpywallRetry
+        The retry policy of the session.
+    session : requests.Session
+        The underlying requests session.
+    """
+
+    def __init__(self,
+                 pool_size: int = 10,
+                 timeout=(10, 30),
+                 retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 jitter: float = 0.5,
+                 max_retry_after: float = 120) -> None:
+        """
+        Create a session.
+
+        Parameters
+        ----------
+        pool_size : int
+            The number of connections kept open per host.
+        timeout : float or tuple
+            The default timeout in seconds for each request. A tuple sets the
+            connect and read timeouts separately.
+        retries : int
+            The number of retries of a failed request.
+        backoff_factor : float
+            The backoff before the n-th retry is backoff_factor * 2 ** (n - 1)
+            seconds.
+        jitter : float
+            The fraction of the backoff that is random.
+        max_retry_after : float
+            The maximum number of seconds to wait when the server sends a
+            Retry-After header.
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+
+        self.retry = UnpywallRetry(total=retries,
+                                   backoff_factor=backoff_factor,
+                                   jitter=jitter,
+                                   max_retry_after=max_retry_after,
+                                   status_forcelist=(429, 500, 502, 503,
+                                                     504),
+                                   allowed_methods=frozenset(['GET',
+                                                              'HEAD']),
+                                   raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size,
+                              max_retries=self.retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __repr__(self) -> str:
+        return ('UnpywallSession(pool_size={0}, timeout={1},'
+                ' retries={2})').format(self.pool_size,
+                                        self.timeout,
+                                        self.retries)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a GET request through the connection pool.
+
+        Parameters
+        ----------
+        url : str
+            The URL to be requested.
+        **kwargs
+            Keyword arguments passed to requests.Session.get. If no timeout
+            is given, the default timeout of the session is used.
+
+        Returns
+        -------
+        requests.Response
+            The response of the server.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self) -> None:
+        """
+        Close all pooled connections.
+        """
+        self.session.close()